@@ -0,0 +1,291 @@
+# importing required libraries
+import asyncio
+import math
+import os
+import threading
+import time
+import zipfile
+
+from pypdf import PdfReader
+
+from docx_stream import text_part_names
+from extraction_cache import extraction_cache, file_sha256
+from extractors import MIN_PAGE_TEXT_CHARS, cache_version
+from tracing import stage_seconds
+
+# Cost units that may be in flight at once; a document costing more runs only when nothing else does
+ADMISSION_CAPACITY = float(os.getenv("ADMISSION_CAPACITY", "100"))
+# Documents admitted at once, whatever their cost
+ADMISSION_MAX_RUNNING = int(os.getenv("ADMISSION_MAX_RUNNING", "16"))
+# Cost units allowed to wait; beyond this new work is rejected with a 429
+ADMISSION_MAX_QUEUED_COST = float(os.getenv("ADMISSION_MAX_QUEUED_COST", "1000"))
+# Seconds an interactive request waits for admission before it gets a 429
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "60"))
+# A waiting document's cost counts half after this many seconds, so large ones aren't starved
+ADMISSION_AGING_SECONDS = float(os.getenv("ADMISSION_AGING_SECONDS", "30"))
+
+# Cost model: one unit per document and per MB, plus a per-page cost that is
+# much higher for pages without a text layer, since those are OCR'd
+TEXT_PAGE_COST = float(os.getenv("ADMISSION_TEXT_PAGE_COST", "0.1"))
+SCANNED_PAGE_COST = float(os.getenv("ADMISSION_SCANNED_PAGE_COST", "2"))
+# Pages sampled to decide whether a PDF has a text layer
+TEXT_LAYER_SAMPLE_PAGES = 3
+# Uncompressed WordprocessingML bytes that make up roughly one page
+DOCX_BYTES_PER_PAGE = 12000
+
+MAX_RETRY_AFTER = 600
+
+
+class AdmissionRejected(Exception):
+    """Raised when work can't be queued, or waited too long; carries a Retry-After in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def pdf_pages(pdf_path):
+    """Returns (page count, fraction of sampled pages without a text layer) for a PDF."""
+    with open(pdf_path, "rb") as file:
+        reader = PdfReader(file)
+        pages = len(reader.pages)
+        if not pages:
+            return 0, 0.0
+        step = max(1, pages // TEXT_LAYER_SAMPLE_PAGES)
+        sampled = range(0, pages, step)[:TEXT_LAYER_SAMPLE_PAGES]
+        scanned = sum(
+            1
+            for number in sampled
+            if len((reader.pages[number].extract_text() or "").strip()) < MIN_PAGE_TEXT_CHARS
+        )
+        return pages, scanned / len(sampled)
+
+
+def docx_pages(docx_path):
+    """Estimates a DOCX's page count from the uncompressed size of its text parts."""
+    with zipfile.ZipFile(docx_path) as archive:
+        sizes = {info.filename: info.file_size for info in archive.infolist()}
+    text_bytes = sum(sizes[name] for name in text_part_names(sizes))
+    return max(1, math.ceil(text_bytes / DOCX_BYTES_PER_PAGE))
+
+
+def estimate_cost(file_path):
+    """Estimates the extraction work a document needs, in cost units.
+
+    A document whose text is already in the extraction cache costs one unit.
+    Otherwise the cost grows with its size and page count, and pages without
+    a text layer (OCR) cost far more than text pages. Files that can't be
+    inspected are costed from their size as if every page were scanned.
+    """
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    if extraction_cache.contains(file_sha256(file_path), cache_version(file_path)):
+        return 1.0
+
+    try:
+        if file_path.endswith(".pdf"):
+            pages, scanned = pdf_pages(file_path)
+        else:
+            pages, scanned = docx_pages(file_path), 0.0
+    except Exception:
+        pages, scanned = max(1, math.ceil(size_mb * 10)), 1.0
+    page_cost = TEXT_PAGE_COST + scanned * (SCANNED_PAGE_COST - TEXT_PAGE_COST)
+    return round(1.0 + size_mb + pages * page_cost, 2)
+
+
+class _Ticket:
+    def __init__(self, cost):
+        self.cost = cost
+        self.queued_at = time.monotonic()
+        self.admitted_at = None
+        self.released = False
+        self.event = threading.Event()
+        # Called once on admission, e.g. to wake an event loop awaiting the ticket
+        self.callbacks = []
+        self.work = None
+
+
+class AdmissionController:
+    """Weighted in-flight budget in front of the extraction and analysis work.
+
+    Each document reserves its estimated cost. Work runs while the admitted
+    cost stays within ``capacity``; the rest waits, up to ``max_queued_cost``,
+    beyond which reservations are refused with a Retry-After estimated from
+    how fast admitted work has been finishing. Waiting work is admitted
+    cheapest first, so small documents overtake large ones, and the cost of
+    a waiting document is discounted as it ages so large ones still get in.
+    """
+
+    def __init__(
+        self,
+        capacity=ADMISSION_CAPACITY,
+        max_running=ADMISSION_MAX_RUNNING,
+        max_queued_cost=ADMISSION_MAX_QUEUED_COST,
+        aging_seconds=ADMISSION_AGING_SECONDS,
+    ):
+        self.capacity = capacity
+        self.max_running = max_running
+        self.max_queued_cost = max_queued_cost
+        self.aging_seconds = aging_seconds
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._in_flight = 0.0
+        self._running = 0
+        # Moving average of the seconds admitted work holds per cost unit
+        self._seconds_per_unit = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _fits(self, cost):
+        if self._running == 0:
+            return True
+        return self._running < self.max_running and self._in_flight + cost <= self.capacity
+
+    def _priority(self, ticket, now):
+        if self.aging_seconds <= 0:
+            return ticket.cost
+        return ticket.cost / (1 + (now - ticket.queued_at) / self.aging_seconds)
+
+    def _dispatch(self):
+        """Admits waiting tickets, best priority first, while the budget allows."""
+        while self._waiting:
+            now = time.monotonic()
+            ticket = min(self._waiting, key=lambda ticket: self._priority(ticket, now))
+            if not self._fits(ticket.cost):
+                return
+            self._waiting.remove(ticket)
+            self._in_flight += ticket.cost
+            self._running += 1
+            self.admitted += 1
+            ticket.admitted_at = now
+            stage_seconds.observe(now - ticket.queued_at, stage="admission.queue")
+            ticket.event.set()
+            for callback in ticket.callbacks:
+                callback()
+            if ticket.work is not None:
+                threading.Thread(target=self._run, args=(ticket,), daemon=True).start()
+
+    def _run(self, ticket):
+        func, args = ticket.work
+        try:
+            func(*args)
+        finally:
+            self.release(ticket)
+
+    def retry_after(self, cost=0.0):
+        """Estimates the seconds until ``cost`` more units of work could be admitted."""
+        with self._lock:
+            queued = sum(ticket.cost for ticket in self._waiting)
+            backlog = self._in_flight + queued + cost - self.capacity
+            seconds = backlog * self._seconds_per_unit / self.capacity
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(seconds))))
+
+    def reserve(self, cost, force=False):
+        """Queues ``cost`` units of work and returns its ticket.
+
+        Raises AdmissionRejected when the queue is full, unless ``force`` is
+        set (e.g. for jobs accepted before a restart).
+        """
+        ticket = _Ticket(cost)
+        with self._lock:
+            queued = sum(waiting.cost for waiting in self._waiting)
+            if not force and self._waiting and queued + cost > self.max_queued_cost:
+                self.rejected += 1
+                rejected = True
+            else:
+                rejected = False
+                self._waiting.append(ticket)
+                self._dispatch()
+        if rejected:
+            raise AdmissionRejected("Server is at capacity.", self.retry_after(cost))
+        return ticket
+
+    def _withdraw(self, ticket):
+        """Takes a ticket out of the queue; returns False if it was admitted meanwhile."""
+        with self._lock:
+            if ticket.event.is_set():
+                return False
+            self._waiting.remove(ticket)
+            self._dispatch()
+            return True
+
+    def _timed_out(self, ticket):
+        with self._lock:
+            self.timed_out += 1
+        return AdmissionRejected("Timed out waiting for capacity.", self.retry_after(ticket.cost))
+
+    def wait(self, ticket, timeout=ADMISSION_QUEUE_TIMEOUT):
+        """Blocks until the ticket is admitted; withdraws it and raises AdmissionRejected on timeout."""
+        if ticket.event.wait(timeout) or not self._withdraw(ticket):
+            return
+        raise self._timed_out(ticket)
+
+    async def wait_async(self, ticket, timeout=ADMISSION_QUEUE_TIMEOUT):
+        """Awaits admission on the event loop, without holding a worker thread while queued.
+
+        Withdraws the ticket and raises AdmissionRejected on timeout; if the
+        awaiting task is cancelled the ticket is withdrawn, or released if it
+        was admitted meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(
+                    lambda: admitted.done() or admitted.set_result(None)
+                )
+            except RuntimeError:
+                pass  # the loop has closed; nobody is waiting any more
+
+        with self._lock:
+            if ticket.event.is_set():
+                return
+            ticket.callbacks.append(wake)
+        try:
+            await asyncio.wait_for(admitted, timeout)
+        except asyncio.TimeoutError:
+            if self._withdraw(ticket):
+                raise self._timed_out(ticket)
+        except asyncio.CancelledError:
+            if not self._withdraw(ticket):
+                self.release(ticket)
+            raise
+
+    def submit(self, ticket, func, *args):
+        """Runs ``func(*args)`` on its own thread once the ticket is admitted, then releases it."""
+        with self._lock:
+            ticket.work = (func, args)
+            if ticket.event.is_set():
+                threading.Thread(target=self._run, args=(ticket,), daemon=True).start()
+
+    def release(self, ticket):
+        """Returns an admitted ticket's cost to the budget; releasing twice is a no-op."""
+        with self._lock:
+            if ticket.released or ticket.admitted_at is None:
+                return
+            ticket.released = True
+            self._in_flight -= ticket.cost
+            self._running -= 1
+            if ticket.cost > 0:
+                seconds = (time.monotonic() - ticket.admitted_at) / ticket.cost
+                self._seconds_per_unit = 0.8 * self._seconds_per_unit + 0.2 * seconds
+            self._dispatch()
+
+    def stats(self):
+        """Returns the budget usage, queue and admission counters."""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_flight_cost": round(self._in_flight, 2),
+                "running": self._running,
+                "queued": len(self._waiting),
+                "queued_cost": round(sum(ticket.cost for ticket in self._waiting), 2),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "seconds_per_unit": round(self._seconds_per_unit, 3),
+            }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,111 @@
+# importing required libraries
+import os
+import threading
+
+import autogen
+import httpx
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+AGENT_SPECS = [
+    (
+        "DocumentParser",
+        "Extracts and preprocesses text from uploaded documents, ensuring readability and proper segmentation.",
+    ),
+    (
+        "ComplianceChecker",
+        "Analyzes the document for compliance with grammatical, structural, and clarity guidelines. Checks adherence to professional and regulatory standards.",
+    ),
+    (
+        "ReportGenerator",
+        "Creates an in-depth compliance report detailing strengths, weaknesses, and suggested improvements based on detected violations.",
+    ),
+    (
+        "RewriteAgent",
+        "When requested, rewrite the document to comply with all identified compliance issues while maintaining its original intent and meaning.",
+    ),
+]
+
+
+class PooledHTTPClient(httpx.Client):
+    """Keep-alive HTTP client shared by every agent and streaming call.
+
+    Autogen deep-copies llm_config for each agent, so ``__deepcopy__``
+    returns the same instance to keep one connection pool. New TCP
+    connections are counted through httpcore's trace hook, which tells us
+    how many requests reused a pooled connection.
+    """
+
+    def __init__(self):
+        super().__init__(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=LLM_TIMEOUT,
+            event_hooks={"request": [self._on_request]},
+        )
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _on_request(self, request):
+        with self._stats_lock:
+            self.requests_sent += 1
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._stats_lock:
+                self.connections_opened += 1
+
+    def stats(self):
+        """Returns request and connection counters for the pool."""
+        with self._stats_lock:
+            return {
+                "requests": self.requests_sent,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(
+                    self.requests_sent - self.connections_opened, 0
+                ),
+            }
+
+
+class AgentRegistry:
+    """Builds the Autogen agents once per process and shares them across requests and threads.
+
+    The agents are only ever called with explicit single-turn messages, so
+    they hold no per-document conversation state and can be reused.
+    """
+
+    def __init__(self, llm_config):
+        self.llm_config = llm_config
+        self.http_client = PooledHTTPClient()
+        self._agents = None
+        self._lock = threading.Lock()
+
+    def agents(self):
+        """Returns the (parser, compliance, report, rewrite) agents, building them on first use."""
+        if self._agents is None:
+            with self._lock:
+                if self._agents is None:
+                    config = {**self.llm_config, "http_client": self.http_client}
+                    self._agents = tuple(
+                        autogen.AssistantAgent(
+                            name=name, system_message=system_message, llm_config=config
+                        )
+                        for name, system_message in AGENT_SPECS
+                    )
+        return self._agents
+
+    def reset(self):
+        """Drops the built agents so the next call rebuilds them (e.g. after a config change)."""
+        with self._lock:
+            self._agents = None
@@ -1,95 +1,71 @@
 # importing required libraries
 import os
-import autogen
-import docx
-import easyocr
-from pdf2image import convert_from_path
-from pypdf import PdfReader
+import asyncio
+import contextvars
+import hashlib
+import logging
+import threading
+import time
 from dotenv import load_dotenv
+from openai import OpenAI
+from agent_registry import AgentRegistry
+from extraction_cache import file_sha256
+from extractors import get_document_text
+from findings_store import findings_store
+from llm_cache import cache_key, llm_cache
+from llm_scheduler import current_document, llm_scheduler
+from pipeline import Pipeline, Stage
+from prescreen import prescreen
+from revision_store import revision_store
+from segmentation import (
+    assign_findings,
+    chunk_sentences,
+    estimate_tokens,
+    join_findings,
+    sentence_fingerprint,
+    split_findings,
+    split_sentences,
+)
+from tracing import observe_llm_call, record_span, span
+from upload_store import upload_store
+from verdict_cache import verdict_cache
 
 # Load environment variables from .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Define Groq API key and base URL
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Any OpenAI-compatible endpoint works, e.g. the local stub in llm_stub.py for load tests
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 
 # Autogen's LLM configuration for Groq
 llm_config = {
-    "model": "llama-3.3-70b-versatile",
+    "model": LLM_MODEL,
     "api_key": GROQ_API_KEY,
-    "base_url": "https://api.groq.com/openai/v1",
+    "base_url": LLM_BASE_URL,
 }
 
+agent_registry = AgentRegistry(llm_config)
 
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF, using EasyOCR for scanned pdf if necessary."""
-    with open(pdf_path, "rb") as file:
-        reader = PdfReader(file)
-        text = "\n".join(
-            [page.extract_text() for page in reader.pages if page.extract_text()]
-        )
-
-    if not text.strip():
-        images = convert_from_path(pdf_path)
-        reader = easyocr.Reader(["en"], gpu=False)
-        text = "\n".join(["\n".join(reader.readtext(img, detail=0)) for img in images])
-
-    return text
-
-
-def extract_text_from_docx(docx_path):
-    """Extracts text from a docx"""
-    doc = docx.Document(docx_path)
-    text = "\n".join([para.text for para in doc.paragraphs])
-    return text
-
-
-def get_document_text(file_path):
-    if file_path.endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
-    elif file_path.endswith(".docx"):
-        return extract_text_from_docx(file_path)
-    else:
-        raise ValueError("Unsupported file format")
+# Documents longer than this many (estimated) tokens are analyzed in chunks; 0 disables chunking
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "1500"))
+# Maximum number of chunk analyses in flight at once
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+# Reuse findings for sentences unchanged since the closest previously analyzed version
+INCREMENTAL_RECHECK = os.getenv("INCREMENTAL_RECHECK", "true").lower() == "true"
 
 
 def create_agents():
-    """Creates Autogen agents using the Groq API via OpenAI-compatible settings."""
-    parser_agent = autogen.AssistantAgent(
-        name="DocumentParser",
-        system_message="Extracts and preprocesses text from uploaded documents, ensuring readability and proper segmentation.",
-        llm_config=llm_config,
-    )
-
-    compliance_agent = autogen.AssistantAgent(
-        name="ComplianceChecker",
-        system_message="Analyzes the document for compliance with grammatical, structural, and clarity guidelines. Checks adherence to professional and regulatory standards.",
-        llm_config=llm_config,
-    )
-
-    report_agent = autogen.AssistantAgent(
-        name="ReportGenerator",
-        system_message="Creates an in-depth compliance report detailing strengths, weaknesses, and suggested improvements based on detected violations.",
-        llm_config=llm_config,
-    )
-
-    rewrite_agent = autogen.AssistantAgent(
-        name="RewriteAgent",
-        system_message="When requested, rewrite the document to comply with all identified compliance issues while maintaining its original intent and meaning.",
-        llm_config=llm_config,
-    )
-
-    return parser_agent, compliance_agent, report_agent, rewrite_agent
+    """Returns the shared Autogen agents, which use the Groq API via OpenAI-compatible settings."""
+    return agent_registry.agents()
 
 
-def process_document(file_path, modify=False):
-    """Processes a document through Autogen agents using Groq."""
-    _, compliance_agent, report_agent, rewrite_agent = create_agents()
-
-    text = get_document_text(file_path)
-
-    # Step 1: Compliance check
-    compliance_prompt = f"""
+def build_compliance_prompt(text):
+    """Builds the sentence-by-sentence compliance prompt for a piece of document text."""
+    return f"""
     Perform a **sentence-by-sentence** compliance analysis of the following document. 
 
     For each sentence:
@@ -109,12 +85,294 @@ def process_document(file_path, modify=False):
     {text}
     """
 
-    compliance_response = compliance_agent.generate_reply(
-        messages=[{"role": "user", "content": compliance_prompt}]
+
+def reply_text(reply):
+    """Returns the text of a generate_reply result, which may be a string or a message dict."""
+    if isinstance(reply, dict):
+        return reply.get("content") or ""
+    return reply or ""
+
+
+def llm_endpoint():
+    """Names the server and model replies come from, so cached replies never cross endpoints."""
+    return f"{llm_config['base_url']} {llm_config['model']}"
+
+
+def agent_name(agent):
+    return getattr(agent, "name", None) or type(agent).__name__
+
+
+def generate(agent, prompt):
+    """Sends a single-turn prompt to an agent, serving repeated prompts from the response cache."""
+    name = agent_name(agent)
+    prompt_tokens = estimate_tokens(agent.system_message + prompt)
+    with span("llm", observe=False, agent=name, prompt_tokens=prompt_tokens) as attributes:
+        key = cache_key(llm_endpoint(), agent.system_message, prompt)
+        cached = llm_cache.get(key)
+        attributes["cached"] = cached is not None
+        if cached is not None:
+            return cached
+
+        queued = time.perf_counter()
+        sent = {}
+
+        def send():
+            # Restarted on every attempt, so rate-limit waits and retries aren't counted
+            sent["at"] = time.perf_counter()
+            return agent.generate_reply(messages=[{"role": "user", "content": prompt}])
+
+        reply = reply_text(llm_scheduler.call(send, prompt_tokens))
+        attributes["completion_tokens"] = estimate_tokens(reply)
+        attributes["queue_seconds"] = round(sent["at"] - queued, 4)
+        observe_llm_call(
+            name,
+            time.perf_counter() - sent["at"],
+            prompt_tokens,
+            attributes["completion_tokens"],
+            queue_seconds=sent["at"] - queued,
+        )
+    if reply:
+        llm_cache.put(key, reply)
+    return reply
+
+
+def stream_generate(agent, prompt, document=None):
+    """Yields an agent's reply in pieces as the model generates it.
+
+    Autogen's generate_reply only returns complete replies, so this talks to
+    the same OpenAI-compatible endpoint directly with the agent's system
+    message. Closing the generator early closes the HTTP stream, which stops
+    the generation. Only fully received replies are cached.
+    """
+    key = cache_key(llm_endpoint(), agent.system_message, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    name = agent_name(agent)
+    prompt_tokens = estimate_tokens(agent.system_message + prompt)
+    client = OpenAI(
+        api_key=llm_config["api_key"],
+        base_url=llm_config["base_url"],
+        http_client=agent_registry.http_client,
+    )
+    queued = time.perf_counter()
+    sent = {}
+
+    def send():
+        # Restarted on every attempt, so rate-limit waits and retries aren't counted
+        sent["at"] = time.perf_counter()
+        sent["started_at"] = time.time()
+        return client.chat.completions.create(
+            model=llm_config["model"],
+            messages=[
+                {"role": "system", "content": agent.system_message},
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+        )
+
+    stream = llm_scheduler.call(send, prompt_tokens, key=document)
+    queue_seconds = sent["at"] - queued
+    parts = []
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        stream.close()
+        seconds = time.perf_counter() - sent["at"]
+        completion_tokens = estimate_tokens("".join(parts))
+        observe_llm_call(
+            name, seconds, prompt_tokens, completion_tokens, queue_seconds=queue_seconds
+        )
+        record_span(
+            "llm",
+            sent["started_at"],
+            seconds,
+            agent=name,
+            stream=True,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            queue_seconds=round(queue_seconds, 4),
+        )
+
+    if parts:
+        llm_cache.put(key, "".join(parts))
+
+
+def run_async(coroutine):
+    """Runs a coroutine to completion, even when called from inside a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+    context = contextvars.copy_context()
+
+    def runner():
+        result["value"] = context.run(asyncio.run, coroutine)
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+async def analyze_chunks(compliance_agent, chunks, concurrency=None):
+    """Runs the compliance check on every chunk concurrently, returning replies in chunk order."""
+    semaphore = asyncio.Semaphore(concurrency or ANALYSIS_CONCURRENCY)
+
+    async def analyze(chunk):
+        async with semaphore:
+            return await asyncio.to_thread(
+                generate, compliance_agent, build_compliance_prompt(chunk)
+            )
+
+    return await asyncio.gather(*(analyze(chunk) for chunk in chunks))
+
+
+def run_compliance_check(compliance_agent, text):
+    """Checks the document text for compliance issues.
+
+    Text that fits in CHUNK_TOKEN_BUDGET goes out as a single prompt. Longer
+    text is split into sentence-aligned chunks that are analyzed concurrently,
+    and the per-sentence blocks are merged back in document order.
+    """
+    chunks = [text]
+    if CHUNK_TOKEN_BUDGET > 0:
+        chunks = chunk_sentences(split_sentences(text), CHUNK_TOKEN_BUDGET) or [text]
+
+    if len(chunks) == 1:
+        return generate(compliance_agent, build_compliance_prompt(text))
+
+    replies = run_async(analyze_chunks(compliance_agent, chunks))
+    blocks = []
+    for reply in replies:
+        blocks.extend(split_findings(reply))
+    return join_findings(blocks)
+
+
+def verdict_scope(compliance_agent):
+    """Identifies what produced a sentence verdict, so a new model or prompt doesn't reuse old ones."""
+    return cache_key(
+        llm_endpoint(), compliance_agent.system_message, build_compliance_prompt("")
+    )
+
+
+def check_document(compliance_agent, text, stats=None):
+    """Runs the compliance check, re-analyzing only sentences that changed since a prior version.
+
+    The closest stored version is the one judged by the same model and
+    prompt that shares the most sentences with this text, provided it shares
+    at least REVISION_MIN_SHARED of them. Findings for sentences it already
+    contains are reused. The
+    remaining sentences are looked up in the cross-document verdict cache,
+    so recurring boilerplate is judged once. What is still unknown goes
+    through the local pre-screen, and only sentences it can't confidently
+    clear are sent to the ComplianceChecker; their verdicts are cached. The
+    findings of this version are then stored for the next revision. When a
+    ``stats`` dict is given it is filled with the per-stage sentence counts,
+    the verdict cache hit rate and the tokens it saved.
+    """
+    stats = {} if stats is None else stats
+    sentences = split_sentences(text)
+    fingerprints = [sentence_fingerprint(sentence) for sentence in sentences]
+    if not sentences:
+        return run_compliance_check(compliance_agent, text)
+
+    scope = verdict_scope(compliance_agent)
+    known = {}
+    if INCREMENTAL_RECHECK:
+        prior = revision_store.closest_version(scope, fingerprints)
+        known = revision_store.findings(scope, prior) if prior else {}
+    findings = [known.get(fingerprint) for fingerprint in fingerprints]
+
+    pending = [index for index, finding in enumerate(findings) if finding is None]
+    stats["sentences"] = len(sentences)
+    stats["reused"] = len(sentences) - len(pending)
+
+    with span("check.verdict_cache") as attributes:
+        cached = verdict_cache.get_many(scope, [fingerprints[index] for index in pending])
+        tokens_saved = 0
+        for index in pending:
+            verdict = cached.get(fingerprints[index])
+            if verdict is not None:
+                findings[index] = verdict
+                tokens_saved += estimate_tokens(sentences[index]) + 1 + estimate_tokens(verdict)
+        hits = sum(1 for index in pending if findings[index] is not None)
+        verdict_cache.record_savings(tokens_saved)
+        attributes.update(lookups=len(pending), hits=hits, tokens_saved=tokens_saved)
+    stats["verdict_cache_hits"] = hits
+    stats["verdict_cache_hit_rate"] = hits / len(pending) if pending else None
+    stats["tokens_saved"] = tokens_saved
+    pending = [index for index in pending if findings[index] is None]
+
+    with span("check.prescreen"):
+        needs_llm, _, prescreen_stats = prescreen([sentences[index] for index in pending])
+    stats["prescreen"] = prescreen_stats
+    for index, needed in zip(pending, needs_llm):
+        if not needed:
+            findings[index] = ""
+    pending = [index for index, needed in zip(pending, needs_llm) if needed]
+    stats["sent_to_llm"] = len(pending)
+
+    # What the next revision may reuse; verdicts the reply didn't clearly give are left out
+    trusted = list(findings)
+    blocks = None
+    if pending:
+        pending_sentences = [sentences[index] for index in pending]
+        response = run_compliance_check(compliance_agent, "\n".join(pending_sentences))
+        blocks = split_findings(reply_text(response))
+        matched = set()
+        assigned = assign_findings(pending_sentences, blocks, matched)
+        # Only verdicts the reply clearly gave are kept: blocks that quoted their
+        # sentence, and "no issue" for sentences the analysis got past. Blocks placed
+        # by position and sentences after the last quoted one (the reply may have
+        # been cut short) are only used for this document
+        last_matched = max(matched, default=-1)
+        for position, (index, finding) in enumerate(zip(pending, assigned)):
+            findings[index] = finding
+            if position in matched or (not finding and position < last_matched):
+                trusted[index] = finding
+        verdict_cache.put_many(
+            scope,
+            {
+                fingerprints[index]: trusted[index]
+                for index in pending
+                if trusted[index] is not None
+            },
+        )
+
+    # An empty reply says nothing about the document, so that version isn't stored
+    if INCREMENTAL_RECHECK and blocks != []:
+        doc_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        revision_store.save_version(scope, doc_hash, fingerprints, trusted)
+
+    logger.info(
+        "Compliance check: %d sentences, %d reused, %d from the verdict cache (~%d tokens saved),"
+        " %d screened out locally, %d sent to the LLM",
+        stats["sentences"],
+        stats["reused"],
+        stats["verdict_cache_hits"],
+        stats["tokens_saved"],
+        prescreen_stats.get("screened_out", 0),
+        stats["sent_to_llm"],
     )
 
-    # Step 2: Generate a detailed compliance report
-    report_prompt = f"""
+    blocks = []
+    for finding in findings:
+        blocks.extend(split_findings(finding))
+    return join_findings(blocks)
+
+
+def build_report_prompt(compliance_response):
+    """Builds the report prompt from the sentence-by-sentence compliance analysis."""
+    return f"""
     Generate a **comprehensive compliance report** based on the following **sentence-by-sentence** compliance analysis.
 
     ### **Report Structure:**
@@ -136,35 +394,144 @@ def process_document(file_path, modify=False):
     {compliance_response}
     """
 
-    report_response = report_agent.generate_reply(
-        messages=[{"role": "user", "content": report_prompt}]
-    )
 
-    if modify:
-        # Step 3: Rewrite the document if modification is requested
-        rewrite_prompt = f"""
+def build_rewrite_prompt(text):
+    """Builds the prompt asking for a compliant rewrite of the document."""
+    return f"""
         Rewrite the following document to correct all compliance issues while maintaining its original intent and meaning. Provide only the rewritten text without additional explanations or notes.
+        Keep exactly one output line per input line, in the same order: don't merge, split, add or drop lines, and don't add blank lines.
        
         Original Document:
         {text}
         """
-        rewritten_text = rewrite_agent.generate_reply(
-            messages=[{"role": "user", "content": rewrite_prompt}]
+
+
+def record_findings(file_path, analysis):
+    """Stores the findings of a compliance check for history and search; failures are only logged."""
+    try:
+        digest = file_sha256(file_path)
+        findings_store.record(digest, analysis, filename=upload_store.filename(digest))
+    except Exception:
+        logger.exception("Could not record findings for %s", file_path)
+
+
+def build_pipeline(file_path):
+    """Builds the extract -> check -> report / rewrite stage graph for one document.
+
+    The rewrite only needs the extracted text, so it doesn't wait for (or
+    require) the compliance check and report.
+    """
+    _, compliance_agent, report_agent, rewrite_agent = create_agents()
+
+    def check(inputs):
+        analysis = check_document(compliance_agent, inputs["extract"])
+        record_findings(file_path, analysis)
+        return analysis
+
+    return Pipeline(
+        [
+            Stage("extract", lambda inputs: get_document_text(file_path)),
+            Stage("check", check, deps=["extract"]),
+            Stage(
+                "report",
+                lambda inputs: generate(
+                    report_agent, build_report_prompt(inputs["check"])
+                ),
+                deps=["check"],
+            ),
+            Stage(
+                "rewrite",
+                lambda inputs: generate(
+                    rewrite_agent, build_rewrite_prompt(inputs["extract"])
+                ),
+                deps=["extract"],
+            ),
+        ]
+    )
+
+
+def analyze_document(file_path, stages=("report",), session=None):
+    """Runs only the requested pipeline stages (and what they need) for a document.
+
+    With a PipelineSession, outputs computed earlier for the same file
+    contents are reused. Returns a {stage name: output} mapping.
+    """
+    doc_key = file_sha256(file_path) if session is not None else None
+    token = current_document.set(file_path)
+    try:
+        with span("analyze", file=os.path.basename(file_path), stages=list(stages)):
+            outputs = build_pipeline(file_path).run(
+                stages, session=session, doc_key=doc_key
+            )
+    finally:
+        current_document.reset(token)
+    return {stage: outputs[stage] for stage in stages}
+
+
+def process_document(file_path, modify=False, session=None):
+    """Processes a document through Autogen agents using Groq."""
+    stage = "rewrite" if modify else "report"
+    return analyze_document(file_path, [stage], session=session)[stage]
+
+
+def stream_document(file_path, modify=False, session=None):
+    """Yields the report (or, with modify, the rewritten document) as it is generated.
+
+    The stages the final one depends on run to completion first; only the
+    final stage is streamed. When the session already holds the final
+    output it is yielded in one piece, and a fully streamed output is stored
+    back in the session.
+    """
+    _, _, report_agent, rewrite_agent = create_agents()
+    stage = "rewrite" if modify else "report"
+    doc_key = file_sha256(file_path) if session is not None else None
+    if session is not None and session.has(doc_key, stage):
+        yield session.get(doc_key, stage)
+        return
+
+    # A generator can't scope a context variable around its yields, so the
+    # document key is set in a private context for the prerequisite stages
+    context = contextvars.copy_context()
+    context.run(current_document.set, file_path)
+
+    pipeline = build_pipeline(file_path)
+    if modify:
+        inputs = context.run(
+            pipeline.run, ["extract"], session=session, doc_key=doc_key
+        )
+        tokens = stream_generate(
+            rewrite_agent, build_rewrite_prompt(inputs["extract"]), document=file_path
         )
-        return rewritten_text
+    else:
+        inputs = context.run(pipeline.run, ["check"], session=session, doc_key=doc_key)
+        tokens = stream_generate(
+            report_agent, build_report_prompt(inputs["check"]), document=file_path
+        )
+
+    parts = []
+    for token in tokens:
+        parts.append(token)
+        yield token
 
-    return report_response
+    if session is not None:
+        session.put(doc_key, stage, "".join(parts))
 
 
-def process_file(filename, upload_folder="uploads", modify=False):
-    """Processes a single specified document."""
+def process_file(filename, upload_folder="uploads", modify=False, session=None):
+    """Processes a single specified document.
+
+    Files uploaded through the API are given by the sha256 that /upload
+    returned, never by their client filename.
+    """
     file_path = os.path.join(upload_folder, filename)
+    if not os.path.exists(file_path):
+        file_path = upload_store.path(filename) or file_path
     if not os.path.exists(file_path):
         raise FileNotFoundError(
             f"File '{filename}' not found in '{upload_folder}' directory."
         )
 
-    if filename.endswith(".pdf") or filename.endswith(".docx"):
-        return {filename: process_document(file_path, modify)}
+    if file_path.endswith(".pdf") or file_path.endswith(".docx"):
+        return {filename: process_document(file_path, modify, session=session)}
     else:
         raise ValueError("Unsupported file format")
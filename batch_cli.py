@@ -0,0 +1,154 @@
+# importing required libraries
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents import process_document, reply_text
+from extraction_cache import file_sha256
+from extractors import get_document_text
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+
+def collect_files(targets):
+    """Expands directories (recursively) and glob patterns into a sorted list of supported files."""
+    files = set()
+    for target in targets:
+        if os.path.isdir(target):
+            for root, _, names in os.walk(target):
+                for name in names:
+                    files.add(os.path.join(root, name))
+        else:
+            files.update(glob.glob(target, recursive=True))
+    return sorted(
+        path
+        for path in files
+        if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS)
+    )
+
+
+def checkpoint_key(digest, modify):
+    """Identifies a document and the kind of output produced for it, as "<sha256> <0|1>"."""
+    return f"{digest} {int(modify)}"
+
+
+def load_checkpoint(checkpoint_path):
+    """Returns the checkpoint keys of the documents processed by earlier runs."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as file:
+        lines = [line.strip() for line in file if line.strip()]
+    # Checkpoints from before the mode was recorded only hold report runs' hashes
+    return {line if " " in line else checkpoint_key(line, False) for line in lines}
+
+
+def process_one(path, digest, modify):
+    """Runs one document through the pipeline and returns its JSONL record."""
+    record = {"file": path, "sha256": digest, "modify": modify}
+    start = time.perf_counter()
+    try:
+        get_document_text(path)
+        extracted = time.perf_counter()
+        result = process_document(path, modify)
+        finished = time.perf_counter()
+        record.update(
+            status="ok",
+            result=reply_text(result),
+            timings={
+                "extract_seconds": round(extracted - start, 3),
+                "analysis_seconds": round(finished - extracted, 3),
+                "total_seconds": round(finished - start, 3),
+            },
+        )
+    except Exception as e:
+        record.update(
+            status="error",
+            error=str(e),
+            timings={"total_seconds": round(time.perf_counter() - start, 3)},
+        )
+    record["finished_at"] = time.time()
+    return record
+
+
+def run_batch(targets, output_path, checkpoint_path=None, workers=4, modify=False):
+    """Processes every document under the targets and appends one JSONL record per document.
+
+    Documents already in the checkpoint for the same mode (report or
+    ``modify``), from an earlier, possibly interrupted run, or that
+    duplicate another file in this run are skipped. The checkpoint is appended only after a record has
+    been written, so a crash never marks unfinished work as done. Failed
+    documents are not checkpointed and are retried on the next run.
+    Returns counters for the run.
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    done = load_checkpoint(checkpoint_path)
+
+    queued = []
+    skipped = 0
+    for path in collect_files(targets):
+        digest = file_sha256(path)
+        key = checkpoint_key(digest, modify)
+        if key in done:
+            skipped += 1
+            continue
+        done.add(key)
+        queued.append((path, digest))
+
+    counts = {"processed": 0, "failed": 0, "skipped": skipped}
+    write_lock = threading.Lock()
+    with open(output_path, "a", encoding="utf-8") as output, open(
+        checkpoint_path, "a", encoding="utf-8"
+    ) as checkpoint, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(process_one, path, digest, modify) for path, digest in queued
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                if record["status"] == "ok":
+                    checkpoint.write(checkpoint_key(record["sha256"], modify) + "\n")
+                    checkpoint.flush()
+                    counts["processed"] += 1
+                else:
+                    counts["failed"] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run compliance checks over directories or glob patterns of PDF/Word documents."
+    )
+    parser.add_argument("targets", nargs="+", help="Directories or glob patterns")
+    parser.add_argument(
+        "-o", "--output", default="batch_results.jsonl", help="JSONL file to append results to"
+    )
+    parser.add_argument(
+        "--checkpoint", help="File of processed content hashes and modes (default: <output>.checkpoint)"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=4, help="Documents processed concurrently"
+    )
+    parser.add_argument(
+        "--modify", action="store_true", help="Produce rewritten documents instead of reports"
+    )
+    args = parser.parse_args(argv)
+
+    counts = run_batch(
+        args.targets, args.output, args.checkpoint, workers=args.workers, modify=args.modify
+    )
+    print(
+        f"Processed {counts['processed']}, failed {counts['failed']}, "
+        f"skipped {counts['skipped']} already processed."
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+# importing required libraries
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+BENCHMARK_BASELINE = os.getenv("BENCHMARK_BASELINE", "benchmark_baseline.json")
+# Throughput may drop (and latency rise) by this fraction before a run counts as a regression
+BENCHMARK_TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", "0.2"))
+
+CORPUS_KINDS = ("docx", "pdf", "scanned")
+DEFAULT_SIZES = (1, 10, 50)
+SENTENCES_PER_PAGE = 12
+
+WORDS = (
+    "the policy requires every employee to report incidents within two working days "
+    "and managers must review the records before the end of each quarter while "
+    "the compliance team checks that documents are stored securely and shared only "
+    "with approved partners under the data protection agreement"
+).split()
+# A few sentences carry deliberate errors, so the pre-screen and LLM have something to find
+FLAWED = [
+    "The report were submitted late by the the finance team.",
+    "Employees should sends their timesheets every friday .",
+    "This document have been reviewed ,and approved by legal.",
+]
+
+
+def synthetic_pages(pages, seed=0):
+    """Returns ``pages`` lists of deterministic English-like sentences."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(pages):
+        sentences = []
+        for _ in range(SENTENCES_PER_PAGE):
+            if rng.random() < 0.15:
+                sentences.append(rng.choice(FLAWED))
+            else:
+                words = rng.sample(WORDS, rng.randint(8, 16))
+                sentences.append(" ".join(words).capitalize() + ".")
+        corpus.append(sentences)
+    return corpus
+
+
+def write_docx(path, pages, seed=0):
+    """Writes a Word document with one paragraph per sentence and a page break per page."""
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+
+    document = Document()
+    for number, sentences in enumerate(synthetic_pages(pages, seed)):
+        for sentence in sentences:
+            document.add_paragraph(sentence)
+        if number < pages - 1:
+            document.paragraphs[-1].add_run().add_break(WD_BREAK.PAGE)
+    document.save(str(path))
+
+
+def write_text_pdf(path, pages, seed=0):
+    """Writes a PDF whose pages carry a real text layer."""
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(str(path))
+    for sentences in synthetic_pages(pages, seed):
+        y = 760
+        for sentence in sentences:
+            pdf.drawString(54, y, sentence)
+            y -= 18
+        pdf.showPage()
+    pdf.save()
+
+
+def write_scanned_pdf(path, pages, seed=0):
+    """Writes a PDF whose pages are images of text only, as a scanner would produce."""
+    from PIL import Image, ImageDraw
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(str(path))
+    width, height = pdf._pagesize
+    for sentences in synthetic_pages(pages, seed):
+        image = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        y = 80
+        for sentence in sentences:
+            draw.text((80, y), sentence, fill=0)
+            y += 40
+        pdf.drawImage(ImageReader(image), 0, 0, width, height)
+        pdf.showPage()
+    pdf.save()
+
+
+WRITERS = {
+    "docx": (".docx", write_docx),
+    "pdf": (".pdf", write_text_pdf),
+    "scanned": (".pdf", write_scanned_pdf),
+}
+
+
+def build_corpus(directory, kinds=CORPUS_KINDS, sizes=DEFAULT_SIZES):
+    """Generates one document per kind and size and returns (kind, pages, path) tuples."""
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for kind in kinds:
+        extension, writer = WRITERS[kind]
+        for pages in sizes:
+            path = os.path.join(directory, f"{kind}-{pages}p{extension}")
+            writer(path, pages)
+            corpus.append((kind, pages, path))
+    return corpus
+
+
+class FakeAgent:
+    """Stands in for an Autogen agent, replying after a fixed latency without any network call."""
+
+    def __init__(self, name, latency=0.05, reply="No issues found."):
+        self.name = name
+        self.system_message = f"You are the {name} benchmark stub."
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+
+    def generate_reply(self, messages=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.reply
+
+
+def fake_agents(latency=0.05):
+    """Returns stand-ins for the (user proxy, compliance, report, rewrite) agents."""
+    return tuple(
+        FakeAgent(name, latency)
+        for name in ("user_proxy", "compliance", "report", "rewrite")
+    )
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size so far, in MB, of this process or (RUSAGE_CHILDREN) its largest reaped child."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentiles(samples):
+    """Returns p50/p95/p99 (nearest rank) of a list of seconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99)}
+
+
+def benchmark_document(path, pages, runs, latency):
+    """Measures extraction throughput and end-to-end pipeline latency for one document.
+
+    Every run uses fresh, empty caches so repeated runs measure real work.
+    """
+    import agents
+    import extractors
+    from extraction_cache import ExtractionCache
+    from findings_store import FindingsStore
+    from llm_cache import LLMCache
+    from llm_scheduler import LLMScheduler
+    from revision_store import RevisionStore
+    from verdict_cache import VerdictCache
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    # Untimed first pass: pays one-off import and model costs, and catches extractions
+    # that silently find nothing, whose throughput would be meaningless
+    if not extractors._extract_text(path).strip():
+        raise RuntimeError("No text extracted (is OCR available?)")
+
+    extract_times = []
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        extractors._extract_text(path)
+        extract_times.append(time.perf_counter() - start)
+
+        with tempfile.TemporaryDirectory() as scratch, patch.object(
+            extractors, "extraction_cache", ExtractionCache(os.path.join(scratch, "text"))
+        ), patch.object(
+            agents, "llm_cache", LLMCache(db_path=os.path.join(scratch, "llm.db"))
+        ), patch.object(
+            agents, "revision_store", RevisionStore(db_path=os.path.join(scratch, "rev.db"))
+        ), patch.object(
+            agents, "verdict_cache", VerdictCache(db_path=os.path.join(scratch, "verdicts.db"))
+        ), patch.object(
+            agents, "findings_store", FindingsStore(db_path=os.path.join(scratch, "findings.db"))
+        ), patch.object(
+            agents,
+            "llm_scheduler",
+            LLMScheduler(requests_per_minute=10**6, tokens_per_minute=10**9),
+        ), patch.object(
+            agents, "create_agents", lambda: fake_agents(latency)
+        ):
+            start = time.perf_counter()
+            agents.process_document(path)
+            latencies.append(time.perf_counter() - start)
+
+    extract_seconds = statistics.median(extract_times)
+    return {
+        "pages": pages,
+        "size_mb": round(size_mb, 3),
+        "extract_seconds": round(extract_seconds, 4),
+        "pages_per_second": round(pages / extract_seconds, 2) if extract_seconds else None,
+        "mb_per_second": round(size_mb / extract_seconds, 3) if extract_seconds else None,
+        "latency_seconds": {k: round(v, 4) for k, v in percentiles(latencies).items()},
+    }
+
+
+def measure_document(path, pages, runs, latency):
+    """Runs benchmark_document and adds the peak memory of this process and of its child processes.
+
+    Meant to run in a fresh process per document (see run_benchmarks), since
+    the peak RSS of a process only ever grows.
+    """
+    from ocr_engine import ocr_pool
+
+    row = benchmark_document(path, pages, runs, latency)
+    # RUSAGE_CHILDREN only covers reaped children, so the OCR workers are waited for
+    ocr_pool.shutdown(wait=True)
+    row["peak_rss_mb"] = peak_rss_mb()
+    row["child_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return row
+
+
+def run_benchmarks(
+    directory, kinds=CORPUS_KINDS, sizes=DEFAULT_SIZES, runs=5, latency=0.05
+):
+    """Generates the corpora and benchmarks every document.
+
+    Each document is measured in its own freshly spawned process, so its
+    peak memory isn't that of a larger document measured before it. Returns
+    a JSON-serializable result keyed by "<kind>-<pages>p". Documents that
+    can't be processed here (for example scanned PDFs without poppler
+    installed) are recorded with their error instead of aborting the run.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for kind, pages, path in build_corpus(directory, kinds, sizes):
+        name = f"{kind}-{pages}p"
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(measure_document, path, pages, runs, latency).result()
+        except Exception as e:
+            results[name] = {"pages": pages, "error": str(e)}
+    return {
+        "created_at": time.time(),
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "llm_latency_seconds": latency,
+        "results": results,
+    }
+
+
+def save_baseline(report, path=BENCHMARK_BASELINE):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+
+def load_baseline(path=BENCHMARK_BASELINE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare_to_baseline(report, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Returns a description of every metric that regressed beyond the tolerance."""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric in ("pages_per_second", "mb_per_second"):
+            if previous.get(metric) and current[metric] < previous[metric] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {metric} {current[metric]} < baseline {previous[metric]}"
+                )
+        for key, value in current["latency_seconds"].items():
+            before = previous.get("latency_seconds", {}).get(key)
+            if before and value > before * (1 + tolerance):
+                regressions.append(f"{name}: latency {key} {value}s > baseline {before}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction and the analysis pipeline on synthetic documents."
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Page counts, comma separated"
+    )
+    parser.add_argument(
+        "--kinds", default=",".join(CORPUS_KINDS), help="Corpora: docx, pdf, scanned"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Pipeline runs per document")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds each fake LLM call takes"
+    )
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE, help="Baseline JSON file")
+    parser.add_argument(
+        "--update", action="store_true", help="Write this run as the new baseline"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = run_benchmarks(
+            directory,
+            kinds=args.kinds.split(","),
+            sizes=[int(size) for size in args.sizes.split(",")],
+            runs=args.runs,
+            latency=args.latency,
+        )
+
+    for name, row in report["results"].items():
+        if "error" in row:
+            print(f"{name:>14}  failed ({row['error']})")
+        else:
+            print(
+                f"{name:>14}  {row['pages_per_second']} pages/s, {row['mb_per_second']} MB/s, "
+                f"p50 {row['latency_seconds']['p50']}s, p95 {row['latency_seconds']['p95']}s, "
+                f"peak RSS {row['peak_rss_mb']} MB "
+                f"(largest child process {row['child_peak_rss_mb']} MB)"
+            )
+
+    baseline = load_baseline(args.baseline)
+    if args.update or baseline is None:
+        save_baseline(report, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare_to_baseline(report, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# importing required libraries
+import copy
+import difflib
+import io
+import os
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph as DocxParagraph
+from lxml import etree
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from docx_stream import FALLBACK, text_part_names
+
+# Rewritten paragraphs are paired with originals at most this many positions off their expected place
+ALIGN_WINDOW = 20
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def split_paragraphs(text):
+    """Splits rewritten text into paragraphs, one per non-blank line."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def render_pdf(text):
+    """Renders text as a PDF with one flowable per paragraph and returns it as a buffer.
+
+    Short flowables let reportlab lay out and emit the document page by
+    page; a single huge Paragraph has to be wrapped as one block, which gets
+    disproportionately slow and memory-hungry on long documents.
+    """
+    buffer = io.BytesIO()
+    style = getSampleStyleSheet()["Normal"]
+    flowables = [Paragraph(escape(paragraph), style) for paragraph in split_paragraphs(text)]
+    SimpleDocTemplate(buffer, pagesize=letter).build(flowables)
+    buffer.seek(0)
+    return buffer
+
+
+def set_paragraph_text(paragraph, text):
+    """Replaces a paragraph's text, keeping its style and the formatting of its first run."""
+    runs = paragraph.runs
+    if not runs:
+        paragraph.add_run(text)
+        return
+    runs[0].text = text
+    for run in runs[1:]:
+        run._element.getparent().remove(run._element)
+
+
+def text_paragraphs(doc):
+    """Returns the non-empty paragraphs of every text part, in the order the extractor reads them.
+
+    Also returns the parts that python-docx only holds as raw XML (footnotes,
+    endnotes), parsed, so their edits can be written back before saving.
+    """
+    parts = {str(part.partname).lstrip("/"): part for part in doc.part.package.iter_parts()}
+    paragraphs = []
+    raw_parts = []
+    for name in text_part_names(parts):
+        part = parts[name]
+        element = getattr(part, "element", None)
+        if element is None:
+            element = parse_xml(part.blob)
+            raw_parts.append((part, element))
+        for p in element.iter(qn("w:p")):
+            # The extractor reads only the mc:Choice copy of a text box
+            if any(ancestor.tag == FALLBACK for ancestor in p.iterancestors()):
+                continue
+            paragraph = DocxParagraph(p, part if name == "word/document.xml" else None)
+            if paragraph.text.strip():
+                paragraphs.append((name, paragraph))
+    return paragraphs, raw_parts
+
+
+def normalize_paragraph(text):
+    return " ".join(text.split())
+
+
+def _align_block(originals, rewritten, i1, i2, j1, j2):
+    """Pairs a run of changed paragraphs so that their total word similarity is highest.
+
+    Only pairings within ALIGN_WINDOW of the diagonal are considered, which
+    keeps the cost linear in the document length.
+    """
+    n, m = i2 - i1, j2 - j1
+    old_words = [text.split() for text in originals[i1:i2]]
+    new_words = [text.split() for text in rewritten[j1:j2]]
+    low, high = min(0, m - n) - ALIGN_WINDOW, max(0, m - n) + ALIGN_WINDOW
+    best = {(0, 0): (0.0, None)}
+    for i in range(n + 1):
+        for j in range(max(0, i + low), min(m, i + high) + 1):
+            if (i, j) == (0, 0):
+                continue
+            # Pairing comes first, so it wins ties: a paragraph rewritten without a
+            # word in common still takes its original's place and formatting
+            options = []
+            if (i - 1, j - 1) in best:
+                score = difflib.SequenceMatcher(None, old_words[i - 1], new_words[j - 1]).ratio()
+                options.append((best[i - 1, j - 1][0] + score, (i - 1, j - 1)))
+            if (i - 1, j) in best:
+                options.append((best[i - 1, j][0], (i - 1, j)))
+            if (i, j - 1) in best:
+                options.append((best[i, j - 1][0], (i, j - 1)))
+            best[i, j] = max(options, key=lambda option: option[0])
+
+    pairs = []
+    i, j = n, m
+    while (i, j) != (0, 0):
+        pi, pj = best[i, j][1]
+        pairs.append((i1 + pi if pi < i else None, j1 + pj if pj < j else None))
+        i, j = pi, pj
+    return pairs[::-1]
+
+
+def align_paragraphs(originals, rewritten):
+    """Pairs original with rewritten paragraphs, tolerating ones the rewrite dropped, merged or added.
+
+    Unchanged paragraphs anchor the alignment; between them paragraphs are
+    paired by word similarity, so one dropped line doesn't shift every
+    paragraph after it onto the wrong original. Returns (original index or
+    None, rewritten index or None) pairs in document order.
+    """
+    matcher = difflib.SequenceMatcher(
+        None,
+        [normalize_paragraph(text) for text in originals],
+        [normalize_paragraph(text) for text in rewritten],
+        autojunk=False,
+    )
+    pairs = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            pairs.extend(zip(range(i1, i2), range(j1, j2)))
+        else:
+            pairs.extend(_align_block(originals, rewritten, i1, i2, j1, j2))
+    return pairs
+
+
+def _remove_paragraph(paragraph):
+    parent = paragraph._element.getparent()
+    if parent.tag == qn("w:body"):
+        parent.remove(paragraph._element)
+    else:
+        # Table cells, headers and notes must keep at least one paragraph
+        set_paragraph_text(paragraph, "")
+
+
+def _insert_paragraph(doc, anchor, body, text):
+    """Adds a paragraph after ``anchor`` in its style, or before the first body paragraph."""
+    if anchor is None:
+        following = next((p for p in body if p._element.getparent() is not None), None)
+        if following is None:
+            return doc.add_paragraph(text)
+        element = copy.deepcopy(following._element)
+        following._element.addprevious(element)
+        parent = following._parent
+    else:
+        element = copy.deepcopy(anchor._element)
+        anchor._element.addnext(element)
+        parent = anchor._parent
+    paragraph = DocxParagraph(element, parent)
+    set_paragraph_text(paragraph, text)
+    return paragraph
+
+
+def patch_docx(original, text):
+    """Writes the rewritten paragraphs into a copy of the original DOCX and returns it as a buffer.
+
+    ``original`` is a path or file object. The original's non-empty
+    paragraphs (headers, body and table cells, footers, notes, in the order
+    the extractor reads them) are aligned with the rewritten paragraphs by
+    align_paragraphs, and each receives its counterpart's text, so styles,
+    run formatting, tables and section settings are kept. Added rewritten
+    paragraphs go after the preceding body paragraph in its style; original
+    paragraphs left without a counterpart are removed (or emptied, where
+    Word requires a paragraph to remain).
+    """
+    doc = Document(original)
+    targets, raw_parts = text_paragraphs(doc)
+    paragraphs = split_paragraphs(text)
+    body = [paragraph for name, paragraph in targets if name == "word/document.xml"]
+
+    anchor = None
+    for old, new in align_paragraphs([p.text for _, p in targets], paragraphs):
+        if new is None:
+            _remove_paragraph(targets[old][1])
+        elif old is None:
+            anchor = _insert_paragraph(doc, anchor, body, paragraphs[new])
+        else:
+            name, target = targets[old]
+            # Unchanged paragraphs keep all of their runs
+            if normalize_paragraph(target.text) != normalize_paragraph(paragraphs[new]):
+                set_paragraph_text(target, paragraphs[new])
+            if name == "word/document.xml":
+                anchor = target
+
+    for part, element in raw_parts:
+        part._blob = etree.tostring(
+            element, xml_declaration=True, encoding="UTF-8", standalone=True
+        )
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def render_docx(text):
+    """Writes text into a new DOCX, one paragraph per line, and returns it as a buffer."""
+    doc = Document()
+    for paragraph in split_paragraphs(text):
+        doc.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def build_modified_document(text, filename, original=None):
+    """Builds the downloadable modified document for an uploaded file.
+
+    Returns ``(buffer, download name, mime type)``. DOCX output is patched
+    into ``original`` when it is given, so the original formatting survives.
+    """
+    extension = os.path.splitext(filename)[-1].lower()
+    if extension == ".pdf":
+        buffer = render_pdf(text)
+    elif extension == ".docx":
+        buffer = patch_docx(original, text) if original is not None else render_docx(text)
+    else:
+        raise ValueError("Unsupported file format.")
+    return buffer, f"modified_{filename}", MIME_TYPES[extension]
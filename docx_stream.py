@@ -0,0 +1,93 @@
+# importing required libraries
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+PARAGRAPH = f"{W}p"
+TEXT = f"{W}t"
+TAB = f"{W}tab"
+BREAKS = (f"{W}br", f"{W}cr")
+# Word writes text boxes (and other newer content) twice, as an mc:Choice and an
+# older mc:Fallback rendering of the same text; only the Choice is read
+FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+HEADER_PART = re.compile(r"word/header(\d*)\.xml$")
+FOOTER_PART = re.compile(r"word/footer(\d*)\.xml$")
+
+
+def _part_number(pattern, name):
+    digits = pattern.match(name).group(1)
+    return int(digits) if digits else 0
+
+
+def text_part_names(names):
+    """Orders the text-bearing parts of a DOCX package for reading.
+
+    Headers come first, then the body (tables included, in place), then
+    footers, footnotes and endnotes. Parts missing from ``names`` are skipped.
+    """
+    headers = sorted(
+        (name for name in names if HEADER_PART.match(name)),
+        key=lambda name: _part_number(HEADER_PART, name),
+    )
+    footers = sorted(
+        (name for name in names if FOOTER_PART.match(name)),
+        key=lambda name: _part_number(FOOTER_PART, name),
+    )
+    names = set(names)
+    return (
+        headers
+        + [name for name in ("word/document.xml",) if name in names]
+        + footers
+        + [name for name in ("word/footnotes.xml", "word/endnotes.xml") if name in names]
+    )
+
+
+def iter_part_paragraphs(stream):
+    """Yields the non-empty paragraph texts of one WordprocessingML part as it is parsed.
+
+    Finished elements near the root are dropped as soon as their text has
+    been read, so the partial tree never grows with the document. Deleted
+    (tracked) text and field codes are skipped, as Word's own display does,
+    and so are mc:Fallback copies of text that is also in an mc:Choice.
+    """
+    stack = []
+    paragraphs = []
+    # Depth of mc:Fallback elements the parser is inside
+    fallback = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == FALLBACK:
+                fallback += 1
+            elif elem.tag == PARAGRAPH and not fallback:
+                paragraphs.append([])
+            continue
+
+        stack.pop()
+        if elem.tag == FALLBACK:
+            fallback -= 1
+        elif not fallback:
+            if paragraphs:
+                if elem.tag == TEXT:
+                    paragraphs[-1].append(elem.text or "")
+                elif elem.tag == TAB:
+                    paragraphs[-1].append("\t")
+                elif elem.tag in BREAKS:
+                    paragraphs[-1].append("\n")
+            if elem.tag == PARAGRAPH:
+                text = "".join(paragraphs.pop())
+                elem.clear()
+                if text.strip():
+                    yield text
+        if 0 < len(stack) <= 2:
+            stack[-1].remove(elem)
+
+
+def iter_docx_paragraphs(docx_path):
+    """Yields every non-empty paragraph of a DOCX (headers, body, tables, footers, notes) in reading order."""
+    with zipfile.ZipFile(docx_path) as archive:
+        for name in text_part_names(archive.namelist()):
+            with archive.open(name) as stream:
+                yield from iter_part_paragraphs(stream)
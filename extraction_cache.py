@@ -0,0 +1,124 @@
+# importing required libraries
+import hashlib
+import os
+import threading
+
+CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extraction"))
+MAX_CACHE_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path):
+    """Returns the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """On-disk cache of extracted document text, keyed by content hash and extractor version.
+
+    Entries are plain UTF-8 text files. Recency is tracked with the file mtime,
+    which is refreshed on every hit, so eviction drops the least recently used
+    entries once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, digest, version):
+        return os.path.join(self.cache_dir, f"{digest}-{version}.txt")
+
+    def get(self, digest, version):
+        """Returns the cached text for a digest/version pair, or None on a miss."""
+        path = self._entry_path(digest, version)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                text = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def contains(self, digest, version):
+        """Returns True if text is cached for a digest/version pair, without counting a hit or miss."""
+        return os.path.exists(self._entry_path(digest, version))
+
+    def put(self, digest, version, text):
+        """Stores extracted text and evicts old entries if the cache is over budget."""
+        path = self._entry_path(digest, version)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def invalidate(self, digest=None):
+        """Drops the entries for one digest (all versions), or the whole cache if no digest is given."""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if digest is None or name.startswith(f"{digest}-"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        """Returns hit/miss counters and the current on-disk size."""
+        size = 0
+        entries = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".txt"):
+                entries += 1
+                size += os.path.getsize(os.path.join(self.cache_dir, name))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+extraction_cache = ExtractionCache()
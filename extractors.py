@@ -0,0 +1,235 @@
+# importing required libraries
+import glob
+import os
+import sys
+import time
+
+import docx
+from pypdf import PdfReader
+from docx_stream import iter_docx_paragraphs
+from extraction_cache import extraction_cache, file_sha256
+from ocr_engine import ocr_pdf_pages
+from tracing import observe_pages, span
+
+# Bump whenever extraction output changes so cached text from older code is not reused
+EXTRACTOR_VERSION = "6"
+
+# Pages whose text layer is shorter than this are treated as scanned and OCR'd
+MIN_PAGE_TEXT_CHARS = int(os.getenv("MIN_PAGE_TEXT_CHARS", "20"))
+
+# Backend used for PDFs: a registered name, or "auto" to try AUTO_PDF_ORDER in turn
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "auto")
+AUTO_PDF_ORDER = os.getenv("PDF_EXTRACTOR_ORDER", "pymupdf,pypdf,ocr").split(",")
+
+# Maps a file extension to its {backend name: page-text reader} registry
+EXTRACTORS = {".pdf": {}, ".docx": {}}
+DEFAULT_EXTRACTORS = {".docx": os.getenv("DOCX_EXTRACTOR", "stream")}
+
+
+def register_extractor(extension, name):
+    """Registers a backend that returns a list of per-page texts for a file."""
+
+    def decorator(func):
+        EXTRACTORS[extension][name] = func
+        return func
+
+    return decorator
+
+
+@register_extractor(".pdf", "pypdf")
+def pypdf_page_texts(pdf_path):
+    """Reads the text layer of every page with pypdf."""
+    with open(pdf_path, "rb") as file:
+        reader = PdfReader(file)
+        return [(page.extract_text() or "").strip() for page in reader.pages]
+
+
+@register_extractor(".pdf", "pymupdf")
+def pymupdf_page_texts(pdf_path):
+    """Reads the text layer of every page with PyMuPDF."""
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+@register_extractor(".pdf", "ocr")
+def ocr_page_texts(pdf_path):
+    """OCRs every page, ignoring any text layer."""
+    with open(pdf_path, "rb") as file:
+        page_count = len(PdfReader(file).pages)
+    texts = ocr_pdf_pages(pdf_path, range(1, page_count + 1))
+    return [texts[number] for number in range(1, page_count + 1)]
+
+
+@register_extractor(".docx", "python-docx")
+def python_docx_page_texts(docx_path):
+    """Reads the body paragraphs of a docx; the whole document counts as one page."""
+    doc = docx.Document(docx_path)
+    return ["\n".join([para.text for para in doc.paragraphs])]
+
+
+@register_extractor(".docx", "stream")
+def stream_docx_page_texts(docx_path):
+    """Streams the text of headers, body, tables, footers and notes; the whole document counts as one page."""
+    return ["\n".join(iter_docx_paragraphs(docx_path))]
+
+
+def run_extractor(extension, backend, path):
+    """Runs one registered backend, recording its span and per-page timing."""
+    with span(f"extract.{backend}") as attributes:
+        start = time.perf_counter()
+        page_texts = EXTRACTORS[extension][backend](path)
+        attributes["pages"] = len(page_texts)
+    if page_texts:
+        observe_pages(backend, time.perf_counter() - start, len(page_texts))
+    return page_texts
+
+
+def fill_scanned_pages(pdf_path, page_texts):
+    """OCRs the pages whose text layer is missing or too short, in place."""
+    scanned_pages = [
+        number
+        for number, text in enumerate(page_texts, start=1)
+        if len(text) < MIN_PAGE_TEXT_CHARS
+    ]
+    if scanned_pages:
+        with span("extract.ocr", pages=len(scanned_pages)):
+            start = time.perf_counter()
+            texts = ocr_pdf_pages(pdf_path, scanned_pages)
+        observe_pages("ocr", time.perf_counter() - start, len(scanned_pages))
+        for number, text in texts.items():
+            page_texts[number - 1] = text or page_texts[number - 1]
+    return page_texts
+
+
+def extract_text_from_pdf(pdf_path, backend=None):
+    """Extracts text from a PDF page by page, using EasyOCR only for scanned pages.
+
+    In "auto" mode the backends in AUTO_PDF_ORDER are tried in turn and the
+    first one that yields any text is used; backends that are not installed
+    or fail on the file are skipped. If none yields text, the last failure
+    is raised (a corrupt file, or OCR that didn't run), so it is never
+    mistaken for a document without text.
+    """
+    backend = backend or PDF_EXTRACTOR
+    if backend != "auto":
+        page_texts = run_extractor(".pdf", backend, pdf_path)
+    else:
+        page_texts = None
+        error = None
+        for name in AUTO_PDF_ORDER:
+            try:
+                texts = run_extractor(".pdf", name, pdf_path)
+            except ImportError as e:
+                # Not installed; only an error if no backend can run at all
+                error = error or e
+                continue
+            except Exception as e:
+                error = e
+                continue
+            page_texts, backend = texts, name
+            if any(page_texts):
+                break
+        if not any(page_texts or []) and error is not None:
+            if page_texts is None or not isinstance(error, ImportError):
+                raise error
+        page_texts = page_texts or []
+
+    if backend != "ocr":
+        page_texts = fill_scanned_pages(pdf_path, page_texts)
+
+    return "\n".join([text for text in page_texts if text])
+
+
+def extract_text_from_docx(docx_path, backend=None):
+    """Extracts text from a docx"""
+    backend = backend or DEFAULT_EXTRACTORS[".docx"]
+    return "\n".join(run_extractor(".docx", backend, docx_path))
+
+
+def _extract_text(file_path):
+    if file_path.endswith(".pdf"):
+        return extract_text_from_pdf(file_path)
+    elif file_path.endswith(".docx"):
+        return extract_text_from_docx(file_path)
+    else:
+        raise ValueError("Unsupported file format")
+
+
+def cache_version(file_path):
+    """Cache key suffix: extractor version plus the backend configured for the file type."""
+    if file_path.endswith(".pdf"):
+        backend = PDF_EXTRACTOR
+    else:
+        backend = DEFAULT_EXTRACTORS[".docx"]
+    return f"{EXTRACTOR_VERSION}-{backend}"
+
+
+def get_document_text(file_path):
+    """Returns the document text, reusing cached text for identical file contents."""
+    if not (file_path.endswith(".pdf") or file_path.endswith(".docx")):
+        raise ValueError("Unsupported file format")
+
+    with span("extract.document", file=os.path.basename(file_path)) as attributes:
+        digest = file_sha256(file_path)
+        version = cache_version(file_path)
+        text = extraction_cache.get(digest, version)
+        attributes["cached"] = text is not None
+        if text is None:
+            text = _extract_text(file_path)
+            # Empty text may just be a passing failure, so it is extracted again next time
+            if text:
+                extraction_cache.put(digest, version, text)
+    return text
+
+
+def benchmark_extractors(paths, repeat=3):
+    """Times every registered backend on each file and returns one result per run.
+
+    Throughput is reported in pages and MB per second (a DOCX counts as one
+    page); backends that fail on a file (for example OCR without poppler
+    installed) are reported with their error.
+    """
+    results = []
+    for path in paths:
+        extension = os.path.splitext(path)[-1].lower()
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        for name, func in EXTRACTORS.get(extension, {}).items():
+            try:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    page_texts = func(path)
+                elapsed = (time.perf_counter() - start) / repeat
+            except Exception as e:
+                results.append({"file": path, "backend": name, "error": str(e)})
+                continue
+            results.append(
+                {
+                    "file": path,
+                    "backend": name,
+                    "pages": len(page_texts),
+                    "chars": sum(len(text) for text in page_texts),
+                    "seconds": elapsed,
+                    "pages_per_second": len(page_texts) / elapsed if elapsed else None,
+                    "mb_per_second": size_mb / elapsed if elapsed else None,
+                }
+            )
+    return results
+
+
+if __name__ == "__main__":
+    sample_paths = sys.argv[1:] or sorted(
+        glob.glob(os.path.join("uploads", "*.pdf"))
+        + glob.glob(os.path.join("uploads", "*.docx"))
+        + glob.glob(os.path.join("tests", "*.docx"))
+    )
+    for row in benchmark_extractors(sample_paths):
+        if "error" in row:
+            print(f"{row['backend']:>12}  {row['file']}: failed ({row['error']})")
+        else:
+            print(
+                f"{row['backend']:>12}  {row['file']}: {row['pages']} pages, "
+                f"{row['chars']} chars, {row['pages_per_second']:.1f} pages/s, "
+                f"{row['mb_per_second']:.2f} MB/s"
+            )
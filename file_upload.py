@@ -1,9 +1,25 @@
 # importing required libraries
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 import os
-import aiofiles
+import json
+import logging
 import uvicorn
+from admission import AdmissionRejected, admission_controller, estimate_cost
+from agents import agent_registry, process_document, reply_text, stream_document
+from extractors import get_document_text
+from findings_store import DEFAULT_PAGE_SIZE, findings_store
+from llm_cache import llm_cache
+from llm_scheduler import llm_scheduler
+from job_store import JobStore
+from ocr_engine import OCR_WARMUP, ocr_engine, warm_up_ocr
+from tracing import metrics, trace_request
+from upload_store import UploadTooLarge, upload_store
+from verdict_cache import verdict_cache
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -16,7 +32,58 @@ ALLOWED_EXTENSIONS = {
     "application/msword",
 }
 
-CHUNK_SIZE = 10 * 1024 * 1024
+job_store = JobStore()
+
+
+@app.on_event("startup")
+def warm_ocr_models():
+    """Loads the OCR models in the background so the first scanned PDF doesn't pay for it."""
+    if OCR_WARMUP:
+        warm_up_ocr(background=True)
+
+
+@app.on_event("startup")
+def resume_unfinished_jobs():
+    """Re-enqueues jobs that were queued or running when the server last stopped."""
+    for job_id in job_store.unfinished():
+        try:
+            cost = estimate_cost(job_store.get(job_id)["file_path"])
+        except OSError:
+            cost = 1.0
+        # Already accepted once, so these jobs are queued even past the queue limit
+        ticket = admission_controller.reserve(cost, force=True)
+        admission_controller.submit(ticket, run_job, job_id)
+
+
+@app.get("/ocr/stats")
+def ocr_stats():
+    """Returns OCR model load time and per-page inference timings."""
+    return ocr_engine.stats()
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Returns LLM connection reuse, response and verdict cache, and rate-limit scheduler counters."""
+    return {
+        "http": agent_registry.http_client.stats(),
+        "cache": llm_cache.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "scheduler": llm_scheduler.stats(),
+    }
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Returns the admission budget usage, queue and rejection counters."""
+    return admission_controller.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Returns stage, per-page extraction and LLM call histograms in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 def validate_file_type(file: UploadFile):
@@ -28,25 +95,178 @@ def validate_file_type(file: UploadFile):
         )
 
 
+async def save_upload(file: UploadFile):
+    """Streams an upload into the content-addressed store and returns its stored path."""
+    try:
+        _, file_path, _ = await upload_store.save(file, file.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+
+    return file_path
+
+
+def at_capacity(error):
+    return HTTPException(
+        status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def reserve_capacity(file_path):
+    """Reserves admission budget for a document's estimated cost, or raises a 429."""
+    cost = await run_in_threadpool(estimate_cost, file_path)
+    try:
+        return admission_controller.reserve(cost)
+    except AdmissionRejected as e:
+        raise at_capacity(e)
+
+
+def pre_extract(file_path):
+    """Extracts and caches a document's text ahead of analysis; failures surface later."""
+    try:
+        with trace_request("pre_extract", file=os.path.basename(file_path)):
+            get_document_text(file_path)
+    except Exception:
+        logger.exception("Background extraction failed for %s", file_path)
+
+
+def run_job(job_id):
+    """Runs the compliance pipeline for a queued job and stores the outcome."""
+    job = job_store.get(job_id)
+    if job is None:
+        return
+
+    job_store.mark_running(job_id)
+    try:
+        with trace_request("job", job_id=job_id, filename=job["filename"]):
+            result = process_document(job["file_path"], job["modify"])
+        job_store.mark_done(job_id, reply_text(result))
+    except Exception as e:
+        job_store.mark_failed(job_id, str(e))
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
-    """Handles file upload, validates the file type, and saves it in chunks."""
+    """Handles file upload, validates the file type, and stores it by content hash.
+
+    Text extraction starts in the background once the document is admitted.
+    When the server is at capacity the upload is still accepted and only the
+    pre-extraction is skipped; the text is then extracted at analysis time.
+    """
     validate_file_type(file)
+    file_path = await save_upload(file)
+    cost = await run_in_threadpool(estimate_cost, file_path)
+    try:
+        ticket = admission_controller.reserve(cost)
+    except AdmissionRejected:
+        logger.info("At capacity, skipping pre-extraction of %s", file_path)
+    else:
+        admission_controller.submit(ticket, pre_extract, file_path)
+
+    return JSONResponse(
+        content={
+            "filename": file.filename,
+            "sha256": os.path.splitext(os.path.basename(file_path))[0],
+            "message": "File uploaded successfully.",
+        }
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), modify: bool = False):
+    """Uploads a document and enqueues it for analysis, returning the job id.
+
+    Jobs start as admission budget frees up, smallest documents first.
+    """
+    validate_file_type(file)
+    file_path = await save_upload(file)
+    ticket = await reserve_capacity(file_path)
+
+    job_id = job_store.create(file.filename, file_path, modify)
+    admission_controller.submit(ticket, run_job, job_id)
 
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    return {"job_id": job_id, "status": "queued"}
 
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Returns the status of a job, and its result or error once it has finished."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "modify": job["modify"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@app.get("/findings")
+def search_findings(
+    q: str = None, doc_hash: str = None, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE
+):
+    """Returns a page of stored findings, optionally full-text searched or limited to one document."""
+    return findings_store.search(q, doc_hash=doc_hash, page=page, page_size=page_size)
+
+
+@app.get("/findings/documents")
+def list_analyzed_documents(page: int = 1, page_size: int = DEFAULT_PAGE_SIZE):
+    """Returns a page of analyzed documents with their finding counts, newest first."""
+    return findings_store.documents(page=page, page_size=page_size)
+
+
+@app.get("/analyze/{sha256}/stream")
+async def stream_analysis(sha256: str, request: Request, modify: bool = False):
+    """Streams the report (or rewrite) of an uploaded document as server-sent events.
+
+    The document is identified by the ``sha256`` returned from /upload, so
+    it is always the caller's own bytes whatever its filename. Each event
+    carries a {"token": ...} JSON payload; a final "done" event marks the
+    end. Disconnecting stops the generation upstream. The stream
+    starts once the document is admitted; a 429 is returned when the server
+    is at capacity or admission takes longer than ADMISSION_QUEUE_TIMEOUT.
+    """
+    file_path = upload_store.path(sha256)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+    if not (file_path.endswith(".pdf") or file_path.endswith(".docx")):
+        raise HTTPException(status_code=400, detail="Unsupported file format.")
+
+    ticket = await reserve_capacity(file_path)
     try:
-        async with aiofiles.open(file_path, "wb") as buffer:
-            while True:
-                chunk = await file.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-                await buffer.write(chunk)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+        # Queued on the event loop, so waiting streams don't use up the worker threads
+        await admission_controller.wait_async(ticket)
+    except AdmissionRejected as e:
+        raise at_capacity(e)
 
-    return JSONResponse(
-        content={"filename": file.filename, "message": "File uploaded successfully."}
+    async def events():
+        with trace_request("stream", sha256=sha256, modify=modify):
+            tokens = stream_document(file_path, modify)
+            try:
+                async for token in iterate_in_threadpool(tokens):
+                    if await request.is_disconnected():
+                        break
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+                else:
+                    yield "event: done\ndata: {}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            finally:
+                tokens.close()
+                admission_controller.release(ticket)
+
+    # Also released after the response, in case the body is never iterated
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        background=BackgroundTask(admission_controller.release, ticket),
     )
 
 
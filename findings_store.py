@@ -0,0 +1,244 @@
+# importing required libraries
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from segmentation import finding_sentence, split_findings
+
+FINDINGS_DB_PATH = os.getenv("FINDINGS_DB_PATH", os.path.join(".cache", "findings.db"))
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+ISSUE_LINE = re.compile(r"Issue:\**\s*(.+)")
+SCORE_LINE = re.compile(r"Score:\**\s*([0-9]+(?:\.[0-9]+)?)")
+
+
+def parse_findings(analysis):
+    """Parses a "Sentence / Issue / ---" analysis into finding records.
+
+    Each block becomes one record holding the quoted sentence, its issues
+    (several Issue lines are joined with "; ") and a score. The score is
+    taken from a "Score:" line when the model gives one, otherwise it is the
+    number of issues reported for the sentence. Blocks that quote no
+    sentence, such as a "no issues found" remark, are skipped.
+    """
+    records = []
+    for block in split_findings(analysis):
+        sentence = finding_sentence(block)
+        if not sentence:
+            continue
+        issues = [match.strip().strip("*").strip() for match in ISSUE_LINE.findall(block)]
+        issues = [issue for issue in issues if issue]
+        score = SCORE_LINE.search(block)
+        records.append(
+            {
+                "sentence": sentence,
+                "issue": "; ".join(issues),
+                "score": float(score.group(1)) if score else float(len(issues)),
+            }
+        )
+    return records
+
+
+def fts_query(text):
+    """Quotes every word so user input can't break the full-text query syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class FindingsStore:
+    """SQLite store of per-sentence findings across every analyzed document.
+
+    Documents are keyed by the content hash of the file. Findings carry the
+    sentence, issue, score and timestamps and are indexed with FTS5 (or
+    searched with LIKE where SQLite lacks FTS5), so history can be
+    searched across documents and read a page at a time.
+    """
+
+    def __init__(self, db_path=FINDINGS_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_hash TEXT PRIMARY KEY,
+                    filename TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS findings (
+                    id INTEGER PRIMARY KEY,
+                    doc_hash TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    sentence TEXT NOT NULL,
+                    issue TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS findings_document ON findings (doc_hash, position)"
+            )
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS findings_fts USING fts5("
+                    "sentence, issue, content='findings', content_rowid='id')"
+                )
+                conn.executescript(
+                    """
+                    CREATE TRIGGER IF NOT EXISTS findings_ai AFTER INSERT ON findings BEGIN
+                        INSERT INTO findings_fts (rowid, sentence, issue)
+                        VALUES (new.id, new.sentence, new.issue);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS findings_ad AFTER DELETE ON findings BEGIN
+                        INSERT INTO findings_fts (findings_fts, rowid, sentence, issue)
+                        VALUES ('delete', old.id, old.sentence, old.issue);
+                    END;
+                    """
+                )
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def name_document(self, doc_hash, filename):
+        """Records the display name of a document, creating its entry if needed."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO documents (doc_hash, filename, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (doc_hash) DO UPDATE SET filename = excluded.filename",
+                (doc_hash, filename, now, now),
+            )
+
+    def record(self, doc_hash, analysis, filename=None):
+        """Replaces a document's findings with those parsed from its latest analysis.
+
+        Findings identical to ones already stored for the document keep their
+        original created_at. Returns the number of findings stored.
+        """
+        records = parse_findings(analysis)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            first_seen = {
+                (row["sentence"], row["issue"]): row["created_at"]
+                for row in conn.execute(
+                    "SELECT sentence, issue, created_at FROM findings WHERE doc_hash = ?",
+                    (doc_hash,),
+                )
+            }
+            conn.execute(
+                "INSERT INTO documents (doc_hash, filename, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (doc_hash) DO UPDATE SET updated_at = excluded.updated_at,"
+                " filename = COALESCE(excluded.filename, documents.filename)",
+                (doc_hash, filename, now, now),
+            )
+            conn.execute("DELETE FROM findings WHERE doc_hash = ?", (doc_hash,))
+            conn.executemany(
+                "INSERT INTO findings"
+                " (doc_hash, position, sentence, issue, score, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        doc_hash,
+                        position,
+                        record["sentence"],
+                        record["issue"],
+                        record["score"],
+                        first_seen.get((record["sentence"], record["issue"]), now),
+                        now,
+                    )
+                    for position, record in enumerate(records)
+                ],
+            )
+        return len(records)
+
+    def search(self, query=None, doc_hash=None, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """Returns one page of findings, best matches first when searching.
+
+        Without a query, a document's findings come in document order and
+        findings across all documents newest first.
+        """
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        conditions, params = [], []
+        source = "findings"
+        order = "findings.updated_at DESC, findings.doc_hash, findings.position"
+        if doc_hash:
+            conditions.append("findings.doc_hash = ?")
+            params.append(doc_hash)
+            order = "findings.position"
+        if query and query.strip():
+            if self.full_text:
+                source = "findings JOIN findings_fts ON findings_fts.rowid = findings.id"
+                conditions.append("findings_fts MATCH ?")
+                params.append(fts_query(query))
+                order = "bm25(findings_fts)"
+            else:
+                conditions.append("(findings.sentence LIKE ? OR findings.issue LIKE ?)")
+                params.extend([f"%{query.strip()}%"] * 2)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+            rows = conn.execute(
+                "SELECT findings.id, findings.doc_hash, documents.filename, findings.position,"
+                " findings.sentence, findings.issue, findings.score,"
+                " findings.created_at, findings.updated_at"
+                f" FROM {source} LEFT JOIN documents USING (doc_hash){where}"
+                f" ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size],
+            ).fetchall()
+        return {
+            "items": [dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+        }
+
+    def documents(self, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """Returns one page of analyzed documents with their finding counts, newest first."""
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            rows = conn.execute(
+                "SELECT documents.doc_hash, documents.filename, documents.created_at,"
+                " documents.updated_at, COUNT(findings.id) AS findings"
+                " FROM documents LEFT JOIN findings USING (doc_hash)"
+                " GROUP BY documents.doc_hash"
+                " ORDER BY documents.updated_at DESC LIMIT ? OFFSET ?",
+                (page_size, (page - 1) * page_size),
+            ).fetchall()
+        return {
+            "items": [dict(row) for row in rows],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+        }
+
+
+findings_store = FindingsStore()
@@ -0,0 +1,147 @@
+# importing required libraries
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+# Fraction of the provider limits actually used, so bursts settle just under them
+LLM_RATE_HEADROOM = float(os.getenv("LLM_RATE_HEADROOM", "0.9"))
+# Completion tokens also count against the token limit; reserve this many per call
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "500"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Identifies the document a call belongs to, so queued calls are interleaved per document
+current_document = contextvars.ContextVar("current_document", default=None)
+
+
+def is_rate_limited(error):
+    """Returns True for HTTP 429 errors raised by the OpenAI-compatible client."""
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error):
+    """Returns the server's Retry-After delay in seconds, if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Ticket:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+
+class LLMScheduler:
+    """Central gate that every LLM call goes through.
+
+    Calls reserve their estimated tokens against a rolling window of requests
+    and tokens per ``window`` seconds, scaled by ``headroom``. Waiting calls
+    are queued per document and admitted round-robin across documents, so one
+    large document can't starve the others. Calls rejected with a 429 are
+    retried with jittered exponential backoff, honouring Retry-After.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        headroom=LLM_RATE_HEADROOM,
+        window=60.0,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+    ):
+        self.max_requests = max(1, int(requests_per_minute * headroom))
+        self.max_tokens = max(1, int(tokens_per_minute * headroom))
+        self.window = window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._condition = threading.Condition()
+        self._sent = deque()
+        self._window_tokens = 0
+        self._queues = OrderedDict()
+        self.dispatched = 0
+        self.rate_limited = 0
+
+    def _prune(self, now):
+        while self._sent and now - self._sent[0][0] >= self.window:
+            _, tokens = self._sent.popleft()
+            self._window_tokens -= tokens
+
+    def _fits(self, tokens):
+        if not self._sent:
+            return True
+        return (
+            len(self._sent) < self.max_requests
+            and self._window_tokens + tokens <= self.max_tokens
+        )
+
+    def _is_next(self, key, ticket):
+        front_key = next(iter(self._queues))
+        return front_key == key and self._queues[key][0] is ticket
+
+    def acquire(self, tokens, key=None):
+        """Blocks until the call may be sent, then records it against the budget."""
+        ticket = _Ticket(tokens)
+        with self._condition:
+            self._queues.setdefault(key, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if self._is_next(key, ticket) and self._fits(tokens):
+                    break
+                timeout = None
+                if self._sent:
+                    timeout = max(self.window - (now - self._sent[0][0]), 0.01)
+                self._condition.wait(timeout)
+
+            self._sent.append((time.monotonic(), tokens))
+            self._window_tokens += tokens
+            self.dispatched += 1
+
+            queue = self._queues.pop(key)
+            queue.popleft()
+            if queue:
+                # Back of the line: other documents get their turn first
+                self._queues[key] = queue
+            self._condition.notify_all()
+
+    def call(self, func, prompt_tokens, key=None):
+        """Runs ``func`` once the budget allows, retrying it on 429 responses."""
+        tokens = prompt_tokens + LLM_COMPLETION_TOKEN_ESTIMATE
+        key = key if key is not None else current_document.get()
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, key)
+            try:
+                return func()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                self.rate_limited += 1
+                delay = min(self.backoff_base * 2**attempt, self.backoff_max)
+                time.sleep(max(retry_after(e) or 0, random.uniform(0, delay)))
+
+    def stats(self):
+        """Returns the current window usage and dispatch counters."""
+        with self._condition:
+            self._prune(time.monotonic())
+            return {
+                "requests_in_window": len(self._sent),
+                "tokens_in_window": self._window_tokens,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "dispatched": self.dispatched,
+                "rate_limited": self.rate_limited,
+            }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,250 @@
+# importing required libraries
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from segmentation import estimate_tokens
+
+# Seconds before the first token (or the whole reply, when not streaming) starts
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0.5"))
+# Completion tokens generated per second; 0 sends the reply at once
+LLM_STUB_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "200"))
+# Fraction of requests failed with a 500
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+# Fraction of requests rejected with a 429
+LLM_STUB_RATE_LIMIT_RATE = float(os.getenv("LLM_STUB_RATE_LIMIT_RATE", "0"))
+LLM_STUB_RETRY_AFTER = float(os.getenv("LLM_STUB_RETRY_AFTER", "1"))
+# Requests beyond this many in flight are rejected with a 429, like a saturated provider; 0 is unlimited
+LLM_STUB_MAX_CONCURRENCY = int(os.getenv("LLM_STUB_MAX_CONCURRENCY", "0"))
+# Length of replies to prompts other than the sentence-by-sentence compliance check
+LLM_STUB_REPLY_TOKENS = int(os.getenv("LLM_STUB_REPLY_TOKENS", "200"))
+
+FILLER = (
+    "The document is generally clear but several sentences need attention to "
+    "grammar agreement punctuation and structure before it meets the guidelines"
+).split()
+
+
+def stub_reply(prompt, reply_tokens=LLM_STUB_REPLY_TOKENS):
+    """Builds a deterministic reply shaped like what the agents expect for this prompt.
+
+    Compliance prompts get one "Sentence / Issue" block per document line, so
+    the findings parsing and verdict caching downstream do real work; any
+    other prompt gets about ``reply_tokens`` tokens of filler text.
+    """
+    if "sentence-by-sentence" in prompt and "Document:" in prompt:
+        document = prompt.split("Document:")[-1]
+        sentences = [line.strip() for line in document.splitlines() if line.strip()]
+        return "".join(
+            f'**Sentence:** "{sentence}"\n- **Issue:** Stub finding.\n---\n'
+            for sentence in sentences
+        )
+    words = []
+    while estimate_tokens(" ".join(words)) < reply_tokens:
+        words.extend(FILLER)
+    return " ".join(words)
+
+
+def reply_pieces(reply):
+    """Splits a reply into word-sized pieces to stream, keeping the whitespace."""
+    pieces = []
+    for line in reply.splitlines(keepends=True):
+        words = line.split(" ")
+        pieces.extend(word + " " for word in words[:-1])
+        pieces.append(words[-1])
+    return [piece for piece in pieces if piece]
+
+
+def error_response(status_code, message, error_type, headers=None):
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": status_code}},
+        headers=headers,
+    )
+
+
+def create_app(
+    latency=LLM_STUB_LATENCY,
+    tokens_per_second=LLM_STUB_TOKENS_PER_SECOND,
+    error_rate=LLM_STUB_ERROR_RATE,
+    rate_limit_rate=LLM_STUB_RATE_LIMIT_RATE,
+    retry_after=LLM_STUB_RETRY_AFTER,
+    max_concurrency=LLM_STUB_MAX_CONCURRENCY,
+    reply_tokens=LLM_STUB_REPLY_TOKENS,
+    seed=None,
+):
+    """Builds an OpenAI-compatible chat-completions server that never calls a real model.
+
+    Every request waits ``latency`` seconds, then produces its reply at
+    ``tokens_per_second`` (streamed when asked). Failures are injected at
+    random: 429s with a Retry-After header at ``rate_limit_rate`` and 500s
+    at ``error_rate``, plus a 429 whenever more than ``max_concurrency``
+    requests are in flight. Counters are served on GET /stats.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    stats = {
+        "requests": 0,
+        "in_flight": 0,
+        "max_in_flight": 0,
+        "completed": 0,
+        "rate_limited": 0,
+        "errors": 0,
+        "completion_tokens": 0,
+    }
+
+    def admit():
+        """Counts a request in, or returns the error response it gets instead."""
+        with lock:
+            stats["requests"] += 1
+            roll = rng.random()
+            saturated = 0 < max_concurrency <= stats["in_flight"]
+            if saturated or roll < rate_limit_rate:
+                stats["rate_limited"] += 1
+                return error_response(
+                    429,
+                    "Rate limit reached, please retry.",
+                    "rate_limit_exceeded",
+                    headers={"Retry-After": f"{retry_after:g}"},
+                )
+            if roll < rate_limit_rate + error_rate:
+                stats["errors"] += 1
+                return error_response(500, "Injected stub failure.", "server_error")
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        return None
+
+    def finish(completion_tokens):
+        with lock:
+            stats["in_flight"] -= 1
+            stats["completed"] += 1
+            stats["completion_tokens"] += completion_tokens
+
+    def token_delay(tokens):
+        return tokens / tokens_per_second if tokens_per_second > 0 else 0
+
+    @app.get("/stats")
+    def stub_stats():
+        """Returns request, failure injection and concurrency counters."""
+        with lock:
+            return dict(stats)
+
+    @app.get("/v1/models")
+    def list_models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """Answers a chat completion, streamed as server-sent events when ``stream`` is set."""
+        body = await request.json()
+        rejected = admit()
+        if rejected is not None:
+            return rejected
+
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        user_prompt = next(
+            (m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        reply = stub_reply(user_prompt, reply_tokens)
+        completion_tokens = estimate_tokens(reply)
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": completion_tokens,
+            "total_tokens": estimate_tokens(prompt) + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "stub")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(latency + token_delay(completion_tokens))
+            finally:
+                finish(completion_tokens)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            try:
+                await asyncio.sleep(latency)
+                yield chunk({"role": "assistant", "content": ""})
+                for piece in reply_pieces(reply):
+                    await asyncio.sleep(token_delay(estimate_tokens(piece)))
+                    yield chunk({"content": piece})
+                yield chunk({}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+            finally:
+                finish(completion_tokens)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a local OpenAI-compatible chat-completions stub for load tests."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LLM_STUB_LATENCY)
+    parser.add_argument("--tokens-per-second", type=float, default=LLM_STUB_TOKENS_PER_SECOND)
+    parser.add_argument("--error-rate", type=float, default=LLM_STUB_ERROR_RATE)
+    parser.add_argument("--rate-limit-rate", type=float, default=LLM_STUB_RATE_LIMIT_RATE)
+    parser.add_argument("--retry-after", type=float, default=LLM_STUB_RETRY_AFTER)
+    parser.add_argument("--max-concurrency", type=int, default=LLM_STUB_MAX_CONCURRENCY)
+    parser.add_argument("--reply-tokens", type=int, default=LLM_STUB_REPLY_TOKENS)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    stub = create_app(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        max_concurrency=args.max_concurrency,
+        reply_tokens=args.reply_tokens,
+        seed=args.seed,
+    )
+    uvicorn.run(stub, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
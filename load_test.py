@@ -0,0 +1,215 @@
+# importing required libraries
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks import percentiles, write_docx
+from job_store import DONE, FAILED
+
+LOAD_TEST_URL = os.getenv("LOAD_TEST_URL", "http://127.0.0.1:8000")
+LOAD_TEST_TIMEOUT = float(os.getenv("LOAD_TEST_TIMEOUT", "300"))
+# Seconds between status polls on the jobs path
+JOB_POLL_INTERVAL = 0.2
+# A level whose throughput is less than this much above the previous one counts as saturated
+SATURATION_GAIN = 0.1
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def build_documents(directory, count, pages, offset=0):
+    """Writes ``count`` distinct synthetic Word documents, so caches can't answer for them."""
+    paths = []
+    for number in range(offset, offset + count):
+        path = os.path.join(directory, f"load-{number}.docx")
+        write_docx(path, pages, seed=number)
+        paths.append(path)
+    return paths
+
+
+def upload(client, path):
+    filename = os.path.basename(path)
+    with open(path, "rb") as f:
+        response = client.post("/upload", files={"file": (filename, f, DOCX_MIME)})
+    response.raise_for_status()
+    return response.json()["sha256"]
+
+
+def stream_report(client, sha256, timings, start):
+    """Reads the streamed report of an uploaded document to the end, recording time to first token."""
+    event = "message"
+    with client.stream("GET", f"/analyze/{sha256}/stream") as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                if event == "error":
+                    raise RuntimeError(json.loads(line[len("data: ") :]).get("detail"))
+                if event == "done":
+                    return
+                timings.setdefault("first_token", time.perf_counter() - start)
+            elif not line:
+                event = "message"
+    raise RuntimeError("Stream ended before the done event")
+
+
+def run_job(client, path, timeout):
+    """Submits a document as a job and polls until it finishes."""
+    filename = os.path.basename(path)
+    with open(path, "rb") as f:
+        response = client.post("/jobs", files={"file": (filename, f, DOCX_MIME)})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] == DONE:
+            return
+        if job["status"] == FAILED:
+            raise RuntimeError(job["error"])
+        time.sleep(JOB_POLL_INTERVAL)
+    raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def run_request(client, path, mode, timeout):
+    """Sends one document through the service and returns its phase timings in seconds."""
+    timings = {}
+    start = time.perf_counter()
+    if mode == "jobs":
+        run_job(client, path, timeout)
+    else:
+        sha256 = upload(client, path)
+        timings["upload"] = time.perf_counter() - start
+        stream_report(client, sha256, timings, start)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def run_level(client, paths, clients, mode="stream", timeout=LOAD_TEST_TIMEOUT):
+    """Pushes every document through the service with ``clients`` concurrent clients.
+
+    Returns throughput (completed documents per second), error counts and
+    p50/p95/p99 latency per phase.
+    """
+    results = []
+    errors = {}
+    lock = threading.Lock()
+    remaining = iter(paths)
+
+    def worker():
+        while True:
+            with lock:
+                path = next(remaining, None)
+            if path is None:
+                return
+            try:
+                timings = run_request(client, path, mode, timeout)
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                kind = f"HTTP {status}" if status else type(e).__name__
+                with lock:
+                    errors[kind] = errors.get(kind, 0) + 1
+            else:
+                with lock:
+                    results.append(timings)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for _ in range(clients):
+            executor.submit(worker)
+    seconds = time.perf_counter() - start
+
+    latency = {}
+    for phase in ("upload", "first_token", "total"):
+        samples = [timings[phase] for timings in results if phase in timings]
+        if samples:
+            latency[phase] = {name: round(value, 3) for name, value in percentiles(samples).items()}
+    return {
+        "clients": clients,
+        "requests": len(paths),
+        "completed": len(results),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(results) / seconds, 3) if seconds else 0.0,
+        "latency_seconds": latency,
+    }
+
+
+def saturation_point(levels):
+    """Returns the client count past which adding clients stopped raising throughput, or None."""
+    for previous, level in zip(levels, levels[1:]):
+        if level["throughput"] < previous["throughput"] * (1 + SATURATION_GAIN):
+            return previous["clients"]
+    return None
+
+
+def run_load_test(client, directory, levels, requests, pages=1, mode="stream", timeout=LOAD_TEST_TIMEOUT):
+    """Runs one level per client count, each with its own fresh documents."""
+    report = {"mode": mode, "pages": pages, "levels": []}
+    offset = int(time.time())
+    for clients in levels:
+        paths = build_documents(directory, requests, pages, offset=offset)
+        offset += requests
+        report["levels"].append(run_level(client, paths, clients, mode, timeout))
+    report["saturation_clients"] = saturation_point(report["levels"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive concurrent clients through upload and analysis and report throughput and latency."
+    )
+    parser.add_argument("--url", default=LOAD_TEST_URL, help="Base URL of the FastAPI service")
+    parser.add_argument(
+        "--clients", default="1,2,4,8", help="Concurrent client counts to run, comma separated"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=20, help="Documents sent at each concurrency level"
+    )
+    parser.add_argument("--pages", type=int, default=1, help="Pages per synthetic document")
+    parser.add_argument(
+        "--mode",
+        choices=("stream", "jobs"),
+        default="stream",
+        help="stream: POST /upload then the SSE analysis; jobs: POST /jobs then poll",
+    )
+    parser.add_argument("--timeout", type=float, default=LOAD_TEST_TIMEOUT)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    levels = [int(clients) for clients in args.clients.split(",")]
+    with tempfile.TemporaryDirectory() as directory, httpx.Client(
+        base_url=args.url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=max(levels) * 2),
+    ) as client:
+        report = run_load_test(
+            client, directory, levels, args.requests, args.pages, args.mode, args.timeout
+        )
+
+    for level in report["levels"]:
+        total = level["latency_seconds"].get("total", {})
+        errors = ", ".join(f"{kind}: {count}" for kind, count in level["errors"].items()) or "none"
+        print(
+            f"{level['clients']:>4} clients  {level['throughput']} docs/s, "
+            f"p50 {total.get('p50')}s, p95 {total.get('p95')}s, p99 {total.get('p99')}s, "
+            f"errors {errors}"
+        )
+    if report["saturation_clients"] is not None:
+        print(f"Throughput stops scaling beyond {report['saturation_clients']} clients")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(level["completed"] for level in report["levels"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
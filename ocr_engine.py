@@ -0,0 +1,232 @@
+# importing required libraries
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+import numpy as np
+
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "en").split(",")
+OCR_GPU = os.getenv("OCR_GPU", "false").lower() == "true"
+OCR_WARMUP = os.getenv("OCR_WARMUP", "false").lower() == "true"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+# Pages rendered and held in memory at once per worker
+OCR_RENDER_BATCH = int(os.getenv("OCR_RENDER_BATCH", "4"))
+
+
+class OCREngine:
+    """Process-wide EasyOCR reader that loads the models once and is shared by all callers.
+
+    Model loading happens lazily on first use, or up front via ``warm_up``.
+    Inference is serialized with a lock because the underlying torch models
+    are not guaranteed to be safe for concurrent calls.
+    """
+
+    def __init__(self, languages=None, gpu=OCR_GPU):
+        self.languages = languages or OCR_LANGUAGES
+        self.gpu = gpu
+        self._reader = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+        self._warm_thread = None
+        self.model_load_seconds = None
+        self.pages_processed = 0
+        self.inference_seconds = 0.0
+
+    def get_reader(self):
+        """Returns the shared EasyOCR reader, loading the models on first call."""
+        if self._reader is None:
+            with self._load_lock:
+                if self._reader is None:
+                    import easyocr
+
+                    start = time.perf_counter()
+                    self._reader = easyocr.Reader(self.languages, gpu=self.gpu)
+                    self.model_load_seconds = time.perf_counter() - start
+        return self._reader
+
+    def warm_up(self, background=True):
+        """Loads the OCR models ahead of the first request, optionally in a daemon thread."""
+        if self._reader is not None:
+            return None
+        if not background:
+            self.get_reader()
+            return None
+        with self._load_lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self.get_reader, name="ocr-warmup", daemon=True
+                )
+                self._warm_thread.start()
+        return self._warm_thread
+
+    @property
+    def is_loaded(self):
+        return self._reader is not None
+
+    def read_text(self, image):
+        """Runs OCR on a single page image and returns its lines of text."""
+        return self.read_text_batch([image])[0]
+
+    def read_text_batch(self, images):
+        """Runs batched OCR over page images and returns one list of lines per image.
+
+        EasyOCR only batches images of identical shape, so pages are grouped by
+        size and each group goes through one ``readtext_batched`` call.
+        """
+        reader = self.get_reader()
+        arrays = [np.asarray(image) for image in images]
+        results = [None] * len(arrays)
+        by_shape = {}
+        for index, array in enumerate(arrays):
+            by_shape.setdefault(array.shape, []).append(index)
+
+        with self._inference_lock:
+            start = time.perf_counter()
+            for indexes in by_shape.values():
+                batch = [arrays[index] for index in indexes]
+                if len(batch) == 1:
+                    lines = [reader.readtext(batch[0], detail=0)]
+                else:
+                    lines = reader.readtext_batched(
+                        batch, detail=0, batch_size=len(batch)
+                    )
+                for index, page_lines in zip(indexes, lines):
+                    results[index] = page_lines
+            self.inference_seconds += time.perf_counter() - start
+            self.pages_processed += len(arrays)
+        return results
+
+    def stats(self):
+        """Returns model load time and average per-page inference time."""
+        per_page = (
+            self.inference_seconds / self.pages_processed
+            if self.pages_processed
+            else None
+        )
+        return {
+            "loaded": self.is_loaded,
+            "model_load_seconds": self.model_load_seconds,
+            "pages_processed": self.pages_processed,
+            "inference_seconds": self.inference_seconds,
+            "seconds_per_page": per_page,
+        }
+
+
+ocr_engine = OCREngine()
+
+
+def render_pdf_pages(pdf_path, first_page, last_page):
+    """Rasterizes an inclusive, 1-based page range at the configured DPI."""
+    from pdf2image import convert_from_path
+
+    return convert_from_path(
+        pdf_path,
+        dpi=OCR_DPI,
+        grayscale=OCR_GRAYSCALE,
+        first_page=first_page,
+        last_page=last_page,
+    )
+
+
+def page_windows(page_numbers, size=OCR_RENDER_BATCH):
+    """Splits page numbers into runs of consecutive pages, at most ``size`` long."""
+    windows = []
+    ordered = sorted(page_numbers)
+    for _, run in groupby(enumerate(ordered), key=lambda item: item[1] - item[0]):
+        run = [number for _, number in run]
+        windows.extend(run[i : i + size] for i in range(0, len(run), size))
+    return windows
+
+
+def ocr_pdf_window(pdf_path, page_numbers):
+    """Renders one window of consecutive pages and OCRs it in a single batch."""
+    images = render_pdf_pages(pdf_path, page_numbers[0], page_numbers[-1])
+    pages = ocr_engine.read_text_batch(images)
+    return {number: "\n".join(lines) for number, lines in zip(page_numbers, pages)}
+
+
+def load_worker_reader():
+    """Process pool initializer: loads the worker's reader before it takes any pages."""
+    ocr_engine.get_reader()
+
+
+class OCRWorkerPool:
+    """Long-lived process pool for OCR, shared by every document.
+
+    Each worker loads its EasyOCR reader once, when it starts, and keeps it
+    for the life of the process, so only the first document pays for model
+    loading. Workers are spawned rather than forked to keep torch's thread
+    state sane. The pool is shut down when the interpreter exits.
+    """
+
+    def __init__(self, workers=OCR_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Returns the pool, starting it on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=load_worker_reader,
+                )
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def warm_up(self):
+        """Starts every worker now, so their readers load ahead of the first document."""
+        pool = self.get()
+        for _ in range(self.workers):
+            pool.submit(time.sleep, 0.1)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+ocr_pool = OCRWorkerPool()
+
+
+def warm_up_ocr(background=True):
+    """Loads the OCR models where scanned pages will be recognized.
+
+    With OCR_WORKERS > 1 that is the worker pool, whose workers are started
+    now; otherwise it is the shared in-process reader.
+    """
+    if OCR_WORKERS > 1:
+        ocr_pool.warm_up()
+        return None
+    return ocr_engine.warm_up(background=background)
+
+
+def ocr_pdf_pages(pdf_path, page_numbers, workers=OCR_WORKERS):
+    """OCRs the given pages and returns a {page_number: text} mapping.
+
+    Pages are rendered and recognized in windows of OCR_RENDER_BATCH, so peak
+    memory depends on the window size rather than the page count. With more
+    than one worker the windows are spread over the shared process pool;
+    each worker process holds its own reader, so memory grows with the pool
+    size.
+    """
+    windows = page_windows(page_numbers)
+    texts = {}
+    if workers <= 1 or len(windows) <= 1:
+        for window in windows:
+            texts.update(ocr_pdf_window(pdf_path, window))
+        return texts
+
+    pool = ocr_pool.get()
+    for result in pool.map(ocr_pdf_window, [pdf_path] * len(windows), windows):
+        texts.update(result)
+    return texts
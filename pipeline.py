@@ -0,0 +1,108 @@
+# importing required libraries
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import span
+
+
+class Stage:
+    """A named pipeline step whose function receives the outputs of the stages it depends on."""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class PipelineSession:
+    """Remembers stage outputs per document so later requests in a session can reuse them.
+
+    Outputs are keyed by a document key (the content hash of the file) and
+    the stage name, so a renamed re-upload of the same bytes reuses them too.
+    """
+
+    def __init__(self):
+        self._outputs = {}
+        self._lock = threading.Lock()
+
+    def get(self, doc_key, stage):
+        with self._lock:
+            return self._outputs.get((doc_key, stage))
+
+    def has(self, doc_key, stage):
+        with self._lock:
+            return (doc_key, stage) in self._outputs
+
+    def put(self, doc_key, stage, output):
+        with self._lock:
+            self._outputs[(doc_key, stage)] = output
+
+
+def run_stage(stage, inputs):
+    """Runs one stage inside a tracing span named after it."""
+    with span(stage.name):
+        return stage.func(inputs)
+
+
+class Pipeline:
+    """Runs only the stages needed for the requested targets, in dependency order.
+
+    Stages whose dependencies are satisfied run concurrently (in the
+    caller's context, so context variables carry over), and outputs already
+    held by the session are reused instead of recomputed.
+    """
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+
+    def required(self, targets):
+        """Returns the names of the targets and everything they transitively depend on."""
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage '{name}'")
+            needed.add(name)
+            pending.extend(self.stages[name].deps)
+        return needed
+
+    def run(self, targets, session=None, doc_key=None):
+        """Runs the pipeline and returns a {stage name: output} mapping for the needed stages."""
+        outputs = {}
+        remaining = set()
+        for name in self.required(targets):
+            if session is not None and session.has(doc_key, name):
+                outputs[name] = session.get(doc_key, name)
+            else:
+                remaining.add(name)
+
+        if not remaining:
+            return outputs
+
+        with ThreadPoolExecutor(max_workers=len(remaining)) as pool:
+            running = {}
+            while remaining or running:
+                ready = [
+                    name
+                    for name in remaining
+                    if all(dep in outputs for dep in self.stages[name].deps)
+                ]
+                for name in ready:
+                    stage = self.stages[name]
+                    inputs = {dep: outputs[dep] for dep in stage.deps}
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, run_stage, stage, inputs)] = name
+                    remaining.discard(name)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name] = future.result()
+                    if session is not None:
+                        session.put(doc_key, name, outputs[name])
+
+        return outputs
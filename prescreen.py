@@ -0,0 +1,142 @@
+# importing required libraries
+import os
+import re
+
+# "filter" drops confidently clean sentences before the LLM, "report" only counts them, "off" skips the stage
+PRESCREEN_MODE = os.getenv("PRESCREEN_MODE", "report")
+# Optional newline-separated word list (e.g. /usr/share/dict/words) used to catch misspellings
+PRESCREEN_VOCABULARY = os.getenv("PRESCREEN_VOCABULARY")
+MAX_SENTENCE_WORDS = int(os.getenv("PRESCREEN_MAX_SENTENCE_WORDS", "35"))
+MIN_READING_EASE = float(os.getenv("PRESCREEN_MIN_READING_EASE", "30"))
+
+# Sentences outside this word range are never trusted as clean without the LLM
+CONFIDENT_MIN_WORDS = 4
+CONFIDENT_MAX_WORDS = 25
+
+WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+VOWEL_GROUP = re.compile(r"[aeiouy]+")
+
+CHECKS = [
+    ("repeated word", re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE)),
+    ("double space", re.compile(r"\S  +\S")),
+    ("space before punctuation", re.compile(r"\w\s+[,.;:!?](?![.\d])")),
+    ("missing space after punctuation", re.compile(r"[a-z][,;:](?=[A-Za-z])|[a-z]{2}[.!?](?=[A-Z][a-z])")),
+    ("repeated punctuation", re.compile(r"([,;:!?])\1|\.\.(?!\.)|[,;:][.!?]")),
+    ("lowercase sentence start", re.compile(r"^[\"'(]?[a-z]")),
+    (
+        "subject-verb agreement",
+        re.compile(
+            r"\b(?:he|she|it|this|that)\s+(?:go|do|have|are|were|make|use|need|want|take|be)\b"
+            r"|\b(?:i|you|we|they)\s+(?:is|was|has|does|goes)\b",
+            re.IGNORECASE,
+        ),
+    ),
+    ("article before vowel", re.compile(r"\ba\s+(?:[aeio]\w+|u[^n]\w*)\b", re.IGNORECASE)),
+    (
+        "passive voice",
+        re.compile(
+            r"\b(?:am|is|are|was|were|be|been|being)\s+(?:\w+ly\s+)?"
+            r"(?:\w+ed|known|written|given|taken|made|done|seen|shown|built|held|kept|sent)\b",
+            re.IGNORECASE,
+        ),
+    ),
+]
+
+
+_vocabulary = None
+
+
+def load_vocabulary(path=None):
+    """Loads the optional word list once; returns None when no list is configured."""
+    global _vocabulary
+    path = path or PRESCREEN_VOCABULARY
+    if not path:
+        return None
+    if _vocabulary is None:
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            _vocabulary = {line.strip().lower() for line in file if line.strip()}
+    return _vocabulary
+
+
+def count_syllables(word):
+    """Estimates syllables by counting vowel groups, ignoring a silent trailing "e"."""
+    word = word.lower()
+    if word.endswith("e") and not word.endswith("le") and len(word) > 2:
+        word = word[:-1]
+    return max(1, len(VOWEL_GROUP.findall(word)))
+
+
+def reading_ease(words):
+    """Flesch reading ease of a single sentence given its words."""
+    if not words:
+        return 100.0
+    syllables = sum(count_syllables(word) for word in words)
+    return 206.835 - 1.015 * len(words) - 84.6 * syllables / len(words)
+
+
+def screen_sentence(sentence):
+    """Runs the local checks on one sentence and returns its flags, reading ease and confidence.
+
+    ``confident`` means the sentence passed every check and is simple enough
+    (plain words, moderate length, terminal punctuation) that the local
+    result can be trusted without asking the LLM. Misspellings can only be
+    caught when a vocabulary is configured.
+    """
+    words = WORD.findall(sentence)
+    flags = [name for name, pattern in CHECKS if pattern.search(sentence)]
+
+    if len(words) > MAX_SENTENCE_WORDS:
+        flags.append("long sentence")
+
+    vocabulary = load_vocabulary()
+    if vocabulary is not None and any(
+        len(word) > 2 and word.lower() not in vocabulary for word in words
+    ):
+        flags.append("unknown word")
+
+    ease = reading_ease(words)
+    if len(words) >= 12 and ease < MIN_READING_EASE:
+        flags.append("low readability")
+
+    tokens = sentence.split()
+    confident = (
+        not flags
+        and CONFIDENT_MIN_WORDS <= len(words) <= CONFIDENT_MAX_WORDS
+        and len(words) >= 0.8 * len(tokens)
+        and sentence.rstrip("\"')").endswith((".", "!", "?"))
+    )
+    return {
+        "sentence": sentence,
+        "flags": flags,
+        "reading_ease": round(ease, 1),
+        "confident": confident,
+    }
+
+
+def prescreen(sentences, mode=None):
+    """Screens a whole sentence list and decides which sentences still need the LLM.
+
+    Returns ``(needs_llm, results, stats)``: a bool per sentence, the
+    per-sentence screening results and counters. In "report" mode every
+    sentence still goes to the LLM, but the counters show how many would
+    have been screened out.
+    """
+    mode = mode or PRESCREEN_MODE
+    if mode == "off":
+        return [True] * len(sentences), [], {"mode": mode, "sentences": len(sentences)}
+
+    results = [screen_sentence(sentence) for sentence in sentences]
+    clean = sum(1 for result in results if result["confident"])
+    if mode == "filter":
+        needs_llm = [not result["confident"] for result in results]
+    else:
+        needs_llm = [True] * len(sentences)
+
+    stats = {
+        "mode": mode,
+        "sentences": len(sentences),
+        "flagged": sum(1 for result in results if result["flags"]),
+        "screened_out": clean,
+        "sent_to_llm": sum(needs_llm),
+    }
+    return needs_llm, results, stats
@@ -0,0 +1,173 @@
+# importing required libraries
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+REVISION_DB_PATH = os.getenv("REVISION_DB_PATH", os.path.join(".cache", "revisions.db"))
+REVISION_TTL = float(os.getenv("REVISION_TTL", 30 * 24 * 3600))
+REVISION_MAX_VERSIONS = int(os.getenv("REVISION_MAX_VERSIONS", "2000"))
+# A stored version only counts as a prior revision when at least this share of
+# the sentences in the larger of the two texts is common to both
+REVISION_MIN_SHARED = float(os.getenv("REVISION_MIN_SHARED", "0.5"))
+
+
+class RevisionStore:
+    """SQLite store of sentence-level compliance findings for analyzed document versions.
+
+    Each version is identified by the hash of its extracted text and the
+    scope (model and checker instructions) that judged it. It keeps its
+    sentences' fingerprints in document order together with the finding
+    blocks the ComplianceChecker produced for them ("" for clean sentences).
+    Versions expire after ``ttl`` seconds; beyond ``max_versions`` the least
+    recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        db_path=REVISION_DB_PATH,
+        ttl=REVISION_TTL,
+        max_versions=REVISION_MAX_VERSIONS,
+        min_shared=REVISION_MIN_SHARED,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_versions = max_versions
+        self.min_shared = min_shared
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(versions)")]
+            if columns and "scope" not in columns:
+                # Versions stored before findings were scoped can't be trusted for any model
+                conn.execute("DROP TABLE versions")
+                conn.execute("DROP TABLE IF EXISTS sentences")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS versions (
+                    scope TEXT NOT NULL,
+                    doc_hash TEXT NOT NULL,
+                    sentences INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (scope, doc_hash)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sentences (
+                    scope TEXT NOT NULL,
+                    doc_hash TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    finding TEXT NOT NULL,
+                    PRIMARY KEY (scope, doc_hash, position)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sentences_fingerprint ON sentences (scope, fingerprint)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def closest_version(self, scope, fingerprints):
+        """Returns the live version in ``scope`` sharing the most sentences with the given ones.
+
+        Returns None when no version shares at least ``min_shared`` of the
+        sentences, so unrelated documents are not treated as prior revisions.
+        """
+        wanted = set(fingerprints)
+        if not wanted:
+            return None
+
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE wanted (fingerprint TEXT PRIMARY KEY)")
+            conn.executemany(
+                "INSERT INTO wanted VALUES (?)", [(fingerprint,) for fingerprint in wanted]
+            )
+            row = conn.execute(
+                "SELECT sentences.doc_hash, COUNT(DISTINCT sentences.fingerprint) AS shared,"
+                " versions.sentences"
+                " FROM sentences JOIN wanted USING (fingerprint)"
+                " JOIN versions USING (scope, doc_hash)"
+                " WHERE sentences.scope = ? AND versions.created_at >= ?"
+                " GROUP BY sentences.doc_hash"
+                " ORDER BY shared DESC, versions.created_at DESC LIMIT 1",
+                (scope, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        doc_hash, shared, stored = row
+        if shared < self.min_shared * max(len(wanted), stored):
+            return None
+        return doc_hash
+
+    def findings(self, scope, doc_hash):
+        """Returns a {fingerprint: finding} mapping for a stored version."""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE versions SET accessed_at = ? WHERE scope = ? AND doc_hash = ?",
+                (time.time(), scope, doc_hash),
+            )
+            rows = conn.execute(
+                "SELECT fingerprint, finding FROM sentences WHERE scope = ? AND doc_hash = ?",
+                (scope, doc_hash),
+            ).fetchall()
+        return dict(rows)
+
+    def save_version(self, scope, doc_hash, fingerprints, findings):
+        """Stores (or replaces) the per-sentence findings of a document version.
+
+        Sentences whose finding is None aren't stored, so they are analyzed
+        again. Expired and least recently used versions are evicted afterwards.
+        """
+        rows = [
+            (position, fingerprint, finding)
+            for position, (fingerprint, finding) in enumerate(zip(fingerprints, findings))
+            if finding is not None
+        ]
+        if not rows:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM sentences WHERE scope = ? AND doc_hash = ?", (scope, doc_hash)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO versions"
+                " (scope, doc_hash, sentences, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, doc_hash, len({fingerprint for _, fingerprint, _ in rows}), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO sentences (scope, doc_hash, position, fingerprint, finding)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(scope, doc_hash, *row) for row in rows],
+            )
+            conn.execute("DELETE FROM versions WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM versions WHERE rowid IN ("
+                " SELECT rowid FROM versions ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_versions,),
+            )
+            conn.execute(
+                "DELETE FROM sentences WHERE NOT EXISTS ("
+                " SELECT 1 FROM versions"
+                " WHERE versions.scope = sentences.scope AND versions.doc_hash = sentences.doc_hash"
+                ")"
+            )
+
+
+revision_store = RevisionStore()
@@ -0,0 +1,146 @@
+# importing required libraries
+import difflib
+import hashlib
+import math
+import re
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+FINDING_SEPARATOR = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+FINDING_SENTENCE = re.compile(r"Sentence:\**\s*[\"“]?(.*?)[\"”]?\s*$", re.MULTILINE)
+
+# Rough characters-per-token ratio for English text with Llama-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def join_wrapped_lines(text):
+    """Rejoins lines that a PDF text layer wrapped in the middle of a sentence.
+
+    A line is treated as a continuation when the previous line doesn't end a
+    sentence and the line itself starts with a lowercase letter.
+    """
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if (
+            lines
+            and stripped[:1].islower()
+            and not lines[-1].rstrip().endswith((".", "!", "?", ":"))
+        ):
+            lines[-1] = f"{lines[-1].rstrip()} {stripped}"
+        else:
+            lines.append(line)
+    return lines
+
+
+def split_sentences(text):
+    """Splits document text into sentences, treating line breaks as boundaries except for wrapped lines."""
+    sentences = []
+    for line in join_wrapped_lines(text):
+        for sentence in SENTENCE_BOUNDARY.split(line):
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+
+def estimate_tokens(text):
+    """Estimates the token count of a piece of text without a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def chunk_sentences(sentences, max_tokens):
+    """Groups consecutive sentences into chunks of at most ``max_tokens`` each.
+
+    A sentence longer than the budget becomes a chunk of its own rather than
+    being cut mid-sentence.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = estimate_tokens(sentence) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def split_findings(response):
+    """Splits a "Sentence / Issue / ---" analysis into its per-sentence blocks.
+
+    Any preamble or closing remark the model adds around the blocks is dropped
+    as long as at least one block names a sentence.
+    """
+    blocks = [block.strip() for block in FINDING_SEPARATOR.split(response)]
+    blocks = [block for block in blocks if block]
+    with_sentence = [block for block in blocks if "Sentence:" in block]
+    return with_sentence or blocks
+
+
+def join_findings(blocks):
+    """Joins per-sentence blocks back into the "---"-separated analysis format."""
+    if not blocks:
+        return ""
+    return "\n---\n".join(blocks) + "\n---"
+
+
+def normalize_sentence(sentence):
+    """Collapses whitespace so that reflowed but otherwise identical sentences compare equal."""
+    return " ".join(sentence.split())
+
+
+def sentence_fingerprint(sentence):
+    """Returns a stable hash of a normalized sentence."""
+    return hashlib.sha256(normalize_sentence(sentence).encode("utf-8")).hexdigest()
+
+
+def finding_sentence(block):
+    """Returns the sentence quoted in a finding block, or None if it doesn't quote one."""
+    match = FINDING_SENTENCE.search(block)
+    return normalize_sentence(match.group(1)) if match else None
+
+
+def assign_findings(sentences, blocks, matched=None):
+    """Attributes finding blocks to the sentences they quote.
+
+    Returns one string per sentence holding its blocks joined in the
+    "---"-separated format, or "" for sentences the model found no issue
+    with. A block whose quote doesn't closely match any sentence (the model
+    may paraphrase) is attached to the sentence after the last matched one,
+    since the analysis follows document order. When a ``matched`` set is
+    given it receives the indexes of sentences whose blocks all quoted them,
+    exactly or closely, i.e. none were placed by position alone.
+    """
+    normalized = [normalize_sentence(sentence) for sentence in sentences]
+    positions = {}
+    for index, sentence in enumerate(normalized):
+        positions.setdefault(sentence, index)
+
+    assigned = [[] for _ in sentences]
+    quoted = set()
+    positional = set()
+    last = -1
+    for block in blocks:
+        quote = finding_sentence(block)
+        index = positions.get(quote)
+        if index is None and quote:
+            close = difflib.get_close_matches(quote, normalized, n=1, cutoff=0.6)
+            if close:
+                index = positions[close[0]]
+        if index is not None:
+            quoted.add(index)
+        else:
+            index = min(last + 1, len(sentences) - 1)
+            positional.add(index)
+        if index < 0:
+            continue
+        assigned[index].append(block)
+        last = index
+    if matched is not None:
+        matched.update(quoted - positional)
+    return [join_findings(found) for found in assigned]
@@ -1,24 +1,23 @@
 import streamlit as st
 import os
-import json
-import time
-from docx import Document
-from agents import process_file
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph
+from agents import stream_document
+from document_output import build_modified_document
+from findings_store import findings_store
+from pipeline import PipelineSession
+from ui_state import get_document_state, render_history, show_or_stream
+from upload_store import UPLOAD_OBJECT_DIR
+from ocr_engine import OCR_WARMUP, warm_up_ocr
 
 UPLOAD_FOLDER = "uploads"
-MODIFIED_FOLDER = "modified_documents"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(MODIFIED_FOLDER, exist_ok=True)
+os.makedirs(UPLOAD_OBJECT_DIR, exist_ok=True)
 
 st.set_page_config(
     page_title="Compliance Checker", layout="wide", initial_sidebar_state="expanded"
 )
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = {}
+if OCR_WARMUP:
+    warm_up_ocr(background=True)
 
 with st.sidebar:
     st.image("logo.png", width=180)
@@ -35,11 +34,8 @@ with st.sidebar:
     """,
         unsafe_allow_html=True,
     )
-    st.subheader("📜 Chat History")
-    for subject, messages in st.session_state.chat_history.items():
-        with st.expander(subject):
-            for msg in messages:
-                st.markdown(f"✅ {msg}")
+    st.subheader("📜 History")
+    render_history(findings_store.search, findings_store.documents)
 
 st.markdown(
     """
@@ -60,8 +56,9 @@ st.markdown(
 
 st.markdown("<h1 style='text-align: center;'>Compliance Checker</h1>", unsafe_allow_html=True)
 
-if "modify_clicked" not in st.session_state:
-    st.session_state.modify_clicked = False
+# Stage outputs (extracted text, compliance check, report, rewrite) reused across reruns
+if "pipeline_session" not in st.session_state:
+    st.session_state.pipeline_session = PipelineSession()
 
 st.markdown(
     """
@@ -81,77 +78,63 @@ if uploaded_file:
         st.error("❌ Invalid file type! Please upload a PDF or Word document (.pdf or .docx).")
         st.stop()
 
-    st.session_state.modify_clicked = False
-    file_path = os.path.join(UPLOAD_FOLDER, uploaded_file.name)
-    
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
-    st.session_state["uploaded_filename"] = uploaded_file.name
-    st.session_state["uploaded_file_path"] = file_path
+    # Everything below is memoized per file content, so a rerun (e.g. a button
+    # click) only does the work that hasn't been done yet for this file
+    state = get_document_state(st.session_state, uploaded_file.name, uploaded_file.getvalue())
+    if state.file_path is None:
+        # Stored by content hash, so two different files with the same name never collide
+        file_path = os.path.join(UPLOAD_OBJECT_DIR, f"{state.digest}{file_extension}")
+        if not os.path.exists(file_path):
+            with open(file_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+        state.file_path = file_path
+        findings_store.name_document(state.digest, uploaded_file.name)
+    file_path = state.file_path
 
     col1, col2 = st.columns([1, 2])
     with col1:
         st.info(f"**Uploaded File:** {uploaded_file.name}")
 
-    st.markdown("🔄 **Processing file...** Please wait.", unsafe_allow_html=True)
-
-    with st.spinner("🔍 **Analyzing document...**"):
-        try:
-            time.sleep(3)
-            report = process_file(uploaded_file.name, UPLOAD_FOLDER)
-            compliance_text = next(iter(report.values())) if isinstance(report, dict) else json.loads(report.replace("'", '"')).get(uploaded_file.name, "")
-
-            subject = uploaded_file.name
-            if subject not in st.session_state.chat_history:
-                st.session_state.chat_history[subject] = []
-            st.session_state.chat_history[subject].append(compliance_text)
-
-            st.subheader("Compliance Report")
-            st.markdown(f"<div class='css-18e3th9'>{compliance_text}</div>", unsafe_allow_html=True)
-
-            st.subheader("Do you want to modify the document to comply with guidelines?")
-            if st.button("Modify Document", key="modify_btn"):
-                st.session_state.modify_clicked = True
-
-            if st.session_state.modify_clicked:
-                with st.spinner("🔧 **Modifying document...**"):
-                    modification_result = process_file(uploaded_file.name, UPLOAD_FOLDER, modify=True)
-                    modified_doc = next(iter(modification_result.values())) if isinstance(modification_result, dict) else json.loads(modification_result.replace("'", '"')).get(uploaded_file.name, "")
-
-                    if modified_doc:
-                        st.subheader("Modified Document")
-                        file_extension = os.path.splitext(uploaded_file.name)[-1]
-                        modified_filename = f"modified_{uploaded_file.name}"
-                        modified_path = os.path.join(MODIFIED_FOLDER, modified_filename)
-
-                        if file_extension.lower() == ".pdf":
-                            doc = SimpleDocTemplate(modified_path, pagesize=letter)
-                            styles = getSampleStyleSheet()
-                            paragraph = Paragraph(modified_doc.replace("\n", "<br/>"), styles["Normal"])
-                            doc.build([paragraph])
-                            mime_type = "application/pdf"
-                        elif file_extension.lower() == ".docx":
-                            doc = Document()
-                            for line in modified_doc.split("\n"):
-                                doc.add_paragraph(line)
-                            doc.save(modified_path)
-                            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        else:
-                            st.error("Unsupported file format.")
-                            st.stop()
-
-                        if os.path.exists(modified_path):
-                            st.success("Modified document saved!")
-
-                        with open(modified_path, "rb") as f:
-                            st.download_button(
-                                label="Download Modified Document",
-                                data=f,
-                                file_name=modified_filename,
-                                mime=mime_type,
-                                key="download_btn",
-                            )
-
-        except Exception as e:
-            st.error(f"Error processing file: {str(e)}")
+    try:
+        st.subheader("Compliance Report")
+        show_or_stream(
+            state,
+            "report",
+            lambda: stream_document(file_path, session=st.session_state.pipeline_session),
+            "🔍 **Analyzing document...**",
+        )
+
+        st.subheader("Do you want to modify the document to comply with guidelines?")
+        if st.button("Modify Document", key="modify_btn"):
+            state.rewrite_requested = True
+
+        if state.rewrite_requested:
+            st.subheader("Modified Document")
+            modified_doc = show_or_stream(
+                state,
+                "rewrite",
+                lambda: stream_document(
+                    file_path, modify=True, session=st.session_state.pipeline_session
+                ),
+                "🔧 **Modifying document...**",
+            )
+
+            if modified_doc:
+                if state.download is None:
+                    buffer, modified_filename, mime_type = build_modified_document(
+                        modified_doc, state.name, original=file_path
+                    )
+                    state.download = (buffer.getvalue(), modified_filename, mime_type)
+                    st.success("Modified document ready!")
+
+                data, modified_filename, mime_type = state.download
+                st.download_button(
+                    label="Download Modified Document",
+                    data=data,
+                    file_name=modified_filename,
+                    mime=mime_type,
+                    key="download_btn",
+                )
+
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
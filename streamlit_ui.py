@@ -1,30 +1,56 @@
 # importing required libraries
 import streamlit as st
 import requests
+import io
 import os
 import json
-import time
-from docx import Document
-from agents import process_file
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-
-FASTAPI_URL = "http://127.0.0.1:8000/upload"
+from document_output import build_modified_document
+from ui_state import get_document_state, render_history, show_or_stream
+
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+FASTAPI_URL = f"{API_URL}/upload"
 UPLOAD_FOLDER = "uploads"
-MODIFIED_FOLDER = "modified_documents"
-os.makedirs(MODIFIED_FOLDER, exist_ok=True)
 
 port = os.getenv("PORT", "8501")
 
+
+def stream_from_api(sha256, modify=False):
+    """Yields report (or rewrite) tokens from the API's server-sent events stream."""
+    url = f"{API_URL}/analyze/{sha256}/stream"
+    params = {"modify": str(modify).lower()}
+    with requests.get(url, params=params, stream=True) as response:
+        if response.status_code != 200:
+            raise ValueError(response.json().get("detail", "Unknown error"))
+
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+            elif line.startswith("event:"):
+                event = line[len("event:") :].strip()
+            elif line.startswith("data:"):
+                payload = json.loads(line[len("data:") :])
+                if event == "error":
+                    raise ValueError(payload.get("detail", "Unknown error"))
+                if event == "done":
+                    return
+                yield payload["token"]
+
+
+def fetch_history(path, **params):
+    """Reads one page of stored findings or documents from the API; empty if it is unreachable."""
+    try:
+        response = requests.get(f"{API_URL}{path}", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException:
+        return {"items": [], "total": 0}
+
+
 st.set_page_config(
     page_title="Compliance Checker", layout="wide", initial_sidebar_state="expanded"
 )
 
-# Initialize chat history
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = {}
-
 # Sidebar UI
 with st.sidebar:
     # Add Logo
@@ -51,13 +77,12 @@ with st.sidebar:
         unsafe_allow_html=True,
     )
 
-    # Chat History Section
-    st.subheader("📜 Chat History")
-
-    for subject, messages in st.session_state.chat_history.items():
-        with st.expander(subject):
-            for msg in messages:
-                st.markdown(f"✅ {msg}")
+    # History Section
+    st.subheader("📜 History")
+    render_history(
+        lambda query=None, **params: fetch_history("/findings", q=query, **params),
+        lambda **params: fetch_history("/findings/documents", **params),
+    )
 
 # UI Styling
 st.markdown(
@@ -85,9 +110,6 @@ st.markdown(
     "<h1 style='text-align: center;'>Compliance Checker</h1>", unsafe_allow_html=True
 )
 
-if "modify_clicked" not in st.session_state:
-    st.session_state.modify_clicked = False
-
 st.markdown(
     """
     <style>
@@ -100,143 +122,89 @@ st.markdown(
 uploaded_file = st.file_uploader("Upload a PDF or Word document", type=["pdf", "docx"])
 
 if uploaded_file:
-    # Reset modify button state for a new file
-    st.session_state.modify_clicked = False
-    st.session_state["uploaded_filename"] = uploaded_file.name
-    st.session_state["uploaded_file"] = uploaded_file
+    # Everything below is memoized per file content, so a rerun (e.g. a button
+    # click) only does the work that hasn't been done yet for this file
+    state = get_document_state(
+        st.session_state, uploaded_file.name, uploaded_file.getvalue()
+    )
 
     col1, col2 = st.columns([1, 2])
 
     with col1:
         st.info(f"**Uploaded File:** {uploaded_file.name}")
 
-    st.markdown("🔄 **Processing file...** Please wait.", unsafe_allow_html=True)
-
-    # Uploading the file
-    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-    response = requests.post(FASTAPI_URL, files=files)
-
-    if response.status_code == 200:
-        st.success(f"File '{uploaded_file.name}' uploaded successfully!")
-
-        with st.spinner("🔍 **Analyzing document...**"):
-            try:
-                time.sleep(3)
-                report = process_file(uploaded_file.name, UPLOAD_FOLDER)
-
-                if isinstance(report, dict):
-                    compliance_text = next(iter(report.values()))
-                elif isinstance(report, str):
-                    report_dict = json.loads(report.replace("'", '"'))
-                    compliance_text = next(iter(report_dict.values()))
-                else:
-                    raise ValueError("Invalid report format")
-
-                # Save conversation to history
-                subject = uploaded_file.name
-                if subject not in st.session_state.chat_history:
-                    st.session_state.chat_history[subject] = []
-                st.session_state.chat_history[subject].append(compliance_text)
-
-                # Display Compliance Report
-                st.subheader("Compliance Report")
-                st.markdown(
-                    f"<div class='css-18e3th9'>{compliance_text}</div>",
-                    unsafe_allow_html=True,
-                )
-
-                # Modify Button
-                st.subheader(
-                    "Do you want to modify the document to comply with guidelines?"
-                )
-                st.markdown(
-                    """
-                    <style>
-                    div.stButton > button {
-                        width: auto;
-                        padding: 8px 16px;
-                        font-size: 16px;
-                        background-color: #4CAF50;
-                        color: white;
-                        border-radius: 5px;
-                        border: none;
-                    }
-                    </style>
-                    """,
-                    unsafe_allow_html=True,
+    # Uploaded once per file content; every later request names the upload by
+    # the hash the API returned, never by filename, so it is always these bytes
+    if state.upload_id is None:
+        files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+        with st.spinner("🔄 **Uploading file...**"):
+            response = requests.post(FASTAPI_URL, files=files)
+        if response.status_code != 200:
+            st.error(f"Upload failed: {response.json().get('detail', 'Unknown error')}")
+            st.stop()
+        state.upload_id = response.json()["sha256"]
+
+    st.success(f"File '{uploaded_file.name}' uploaded successfully!")
+
+    try:
+        # Display Compliance Report as it is generated
+        st.subheader("Compliance Report")
+        show_or_stream(
+            state,
+            "report",
+            lambda: stream_from_api(state.upload_id),
+            "🔍 **Analyzing document...**",
+        )
+
+        # Modify Button
+        st.subheader("Do you want to modify the document to comply with guidelines?")
+        st.markdown(
+            """
+            <style>
+            div.stButton > button {
+                width: auto;
+                padding: 8px 16px;
+                font-size: 16px;
+                background-color: #4CAF50;
+                color: white;
+                border-radius: 5px;
+                border: none;
+            }
+            </style>
+            """,
+            unsafe_allow_html=True,
+        )
+
+        if st.button("Modify Document", key="modify_btn"):
+            state.rewrite_requested = True
+
+        if state.rewrite_requested:
+            st.subheader("Modified Document")
+            modified_doc = show_or_stream(
+                state,
+                "rewrite",
+                lambda: stream_from_api(state.upload_id, modify=True),
+                "🔧 **Modifying document...**",
+            )
+
+            if modified_doc:
+                if state.download is None:
+                    buffer, modified_filename, mime_type = build_modified_document(
+                        modified_doc,
+                        state.name,
+                        original=io.BytesIO(uploaded_file.getvalue()),
+                    )
+                    state.download = (buffer.getvalue(), modified_filename, mime_type)
+                    st.success("Modified document ready!")
+
+                data, modified_filename, mime_type = state.download
+                st.download_button(
+                    label="Download Modified Document",
+                    data=data,
+                    file_name=modified_filename,
+                    mime=mime_type,
+                    key="download_btn",
                 )
 
-                if st.button("Modify Document", key="modify_btn"):
-                    st.session_state.modify_clicked = True
-
-                if st.session_state.modify_clicked:
-                    with st.spinner("🔧 **Modifying document...**"):
-                        uploaded_file = st.session_state.uploaded_file
-                        modification_result = process_file(
-                            uploaded_file.name, UPLOAD_FOLDER, modify=True
-                        )
-
-                        modified_doc = None
-                        if isinstance(modification_result, dict):
-                            modified_doc = modification_result.get(
-                                uploaded_file.name, None
-                            )
-                        elif isinstance(modification_result, str):
-                            try:
-                                modified_dict = json.loads(
-                                    modification_result.replace("'", '"')
-                                )
-                                modified_doc = modified_dict.get(
-                                    uploaded_file.name, None
-                                )
-                            except json.JSONDecodeError:
-                                st.error(
-                                    "Error: Invalid JSON format in modification result."
-                                )
-                        else:
-                            st.error("Error: Unexpected modification result format.")
-
-                        if modified_doc:
-                            st.subheader("Modified Document")
-
-                            file_extension = os.path.splitext(uploaded_file.name)[-1]
-                            modified_filename = f"modified_{uploaded_file.name}"
-                            modified_path = os.path.join(
-                                MODIFIED_FOLDER, modified_filename
-                            )
-
-                            if file_extension.lower() == ".pdf":
-                                doc = SimpleDocTemplate(modified_path, pagesize=letter)
-                                styles = getSampleStyleSheet()
-                                paragraph = Paragraph(
-                                    modified_doc.replace("\n", "<br/>"),
-                                    styles["Normal"],
-                                )
-                                doc.build([paragraph])
-                                mime_type = "application/pdf"
-                            elif file_extension.lower() == ".docx":
-                                doc = Document()
-                                for line in modified_doc.split("\n"):
-                                    doc.add_paragraph(line)
-                                doc.save(modified_path)
-                                mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                            else:
-                                st.error("Unsupported file format.")
-                                st.stop()
-
-                            if os.path.exists(modified_path):
-                                st.success("Modified document saved!")
-
-                            with open(modified_path, "rb") as f:
-                                st.download_button(
-                                    label="Download Modified Document",
-                                    data=f,
-                                    file_name=modified_filename,
-                                    mime=mime_type,
-                                    key="download_btn",
-                                )
-
-            except Exception as e:
-                st.error(f"Error processing file: {str(e)}")
-    else:
-        st.error(f"Upload failed: {response.json().get('detail', 'Unknown error')}")
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
@@ -3,12 +3,62 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import hashlib
+import json
 
 # Add the root directory of the project to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from file_upload import app
-from agents import process_file, process_document
+from job_store import JobStore
+from llm_cache import LLMCache
+from llm_scheduler import LLMScheduler
+from pipeline import Pipeline, PipelineSession, Stage
+from prescreen import prescreen
+from revision_store import RevisionStore
+from agents import (
+    check_document,
+    generate,
+    process_file,
+    process_document,
+    run_compliance_check,
+    stream_generate,
+    verdict_scope,
+)
+from extractors import (
+    EXTRACTORS,
+    benchmark_extractors,
+    extract_text_from_pdf,
+    get_document_text,
+)
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+from agent_registry import AgentRegistry
+from pypdf import PdfReader
+from batch_cli import run_batch
+from benchmarks import (
+    compare_to_baseline,
+    fake_agents,
+    run_benchmarks,
+    write_scanned_pdf,
+    write_text_pdf,
+)
+from document_output import align_paragraphs, build_modified_document, patch_docx
+from extraction_cache import ExtractionCache
+from findings_store import FindingsStore, parse_findings
+from llm_stub import create_app as create_llm_stub
+from load_test import run_load_test, saturation_point
+from ocr_engine import (
+    OCREngine,
+    OCRWorkerPool,
+    load_worker_reader,
+    ocr_pdf_pages,
+    page_windows,
+)
+from segmentation import chunk_sentences, split_findings, split_sentences
+from tracing import trace_request
+from ui_state import get_document_state
+from upload_store import UploadStore
+from verdict_cache import VerdictCache
 
 # Create a test client for FastAPI
 client = TestClient(app)
@@ -17,6 +67,64 @@ UPLOAD_DIR = "tests"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(tmp_path):
+    """Gives every test its own empty LLM response cache"""
+    cache = LLMCache(db_path=str(tmp_path / "llm.db"))
+    with patch("agents.llm_cache", cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_revision_store(tmp_path):
+    """Gives every test its own empty store of analyzed document versions"""
+    store = RevisionStore(db_path=str(tmp_path / "revisions.db"))
+    with patch("agents.revision_store", store):
+        yield store
+
+
+@pytest.fixture(autouse=True)
+def isolated_verdict_cache(tmp_path):
+    """Gives every test its own empty cross-document sentence verdict cache"""
+    cache = VerdictCache(db_path=str(tmp_path / "verdicts.db"))
+    with patch("agents.verdict_cache", cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_admission_controller():
+    """Gives every test its own empty admission budget"""
+    controller = AdmissionController()
+    with patch("file_upload.admission_controller", controller):
+        yield controller
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_llm_scheduler():
+    """Keeps mocked LLM calls from eating into the shared rate-limit budget"""
+    scheduler = LLMScheduler(requests_per_minute=100000, tokens_per_minute=10**9)
+    with patch("agents.llm_scheduler", scheduler):
+        yield scheduler
+
+
+@pytest.fixture(autouse=True)
+def isolated_findings_store(tmp_path):
+    """Gives every test its own empty findings history"""
+    store = FindingsStore(db_path=str(tmp_path / "findings.db"))
+    with patch("agents.findings_store", store), patch("file_upload.findings_store", store):
+        yield store
+
+
+@pytest.fixture(autouse=True)
+def isolated_upload_store(tmp_path):
+    """Gives every test its own content-addressed upload storage"""
+    store = UploadStore(
+        object_dir=str(tmp_path / "objects"), db_path=str(tmp_path / "uploads.db")
+    )
+    with patch("file_upload.upload_store", store), patch("agents.upload_store", store):
+        yield store
+
+
 def test_upload_valid_file():
     """Test uploading a valid file"""
     file_path = "tests/sample.docx"
@@ -60,6 +168,627 @@ def test_process_document(mock_text_extraction):
     assert "Compliance Report" in result
 
 
+@patch("agents.get_document_text", return_value="Sample extracted text")
+def test_metrics_and_trace_cover_every_stage(mock_text_extraction, tmp_path):
+    """Test that an analysis records stage and LLM histograms and a per-request trace"""
+    compliance_agent = MagicMock(system_message="check")
+    compliance_agent.name = "ComplianceChecker"
+    compliance_agent.generate_reply.return_value = "No issues."
+    report_agent = MagicMock(system_message="report")
+    report_agent.name = "ReportGenerator"
+    report_agent.generate_reply.return_value = "Compliance Report"
+    with patch(
+        "agents.create_agents",
+        return_value=(None, compliance_agent, report_agent, MagicMock()),
+    ), patch("tracing.TRACE_DIR", str(tmp_path)):
+        with trace_request("test") as trace:
+            process_document("test/sample.docx")
+
+    with open(tmp_path / f"{trace.id}.json") as file:
+        spans = json.load(file)["spans"]
+    names = [span["name"] for span in spans]
+    assert {"analyze", "extract", "check", "report", "llm"} <= set(names)
+    by_id = {span["id"]: span for span in spans}
+    llm_parents = {by_id[span["parent"]]["name"] for span in spans if span["name"] == "llm"}
+    assert llm_parents == {"check", "report"}
+
+    body = client.get("/metrics").text
+    assert 'compliance_stage_seconds_bucket{stage="report",le="+Inf"}' in body
+    assert 'compliance_llm_call_seconds_count{agent="ReportGenerator"}' in body
+    assert 'compliance_llm_prompt_tokens_bucket{agent="ComplianceChecker"' in body
+
+
+def test_llm_call_latency_excludes_rate_limit_waits(isolated_llm_cache):
+    """Test that time queued in the scheduler is recorded apart from the call latency"""
+    import time
+
+    class SlowScheduler:
+        def call(self, func, prompt_tokens, key=None):
+            time.sleep(0.2)
+            return func()
+
+    agent = MagicMock(system_message="check")
+    agent.generate_reply.return_value = "No issues."
+    with patch("agents.llm_scheduler", SlowScheduler()), patch(
+        "agents.observe_llm_call"
+    ) as observe:
+        generate(agent, "prompt")
+
+    (_, seconds, _, _), kwargs = observe.call_args
+    assert seconds < 0.1
+    assert kwargs["queue_seconds"] >= 0.2
+    assert "# TYPE compliance_llm_queue_seconds histogram" in client.get("/metrics").text
+
+
+def test_document_state_is_memoized_by_content():
+    """Test that UI reruns and renamed re-uploads get back the same document state"""
+    session_state = {}
+    state = get_document_state(session_state, "draft.docx", b"contents")
+    state.report = "Compliance Report"
+    state.upload_id = "digest-from-api"
+
+    rerun = get_document_state(session_state, "draft.docx", b"contents")
+    renamed = get_document_state(session_state, "final.docx", b"contents")
+    changed = get_document_state(session_state, "final.docx", b"new contents")
+
+    assert rerun is state and renamed is state
+    assert renamed.name == "final.docx" and renamed.upload_id == "digest-from-api"
+    # Same name, different bytes: a new upload, never the earlier one's id
+    assert changed is not state and changed.report is None and changed.upload_id is None
+
+
+def test_job_lifecycle(tmp_path, isolated_upload_store):
+    """Test enqueuing an analysis job and polling it until it finishes"""
+    import time
+
+    store = JobStore(db_path=str(tmp_path / "jobs.db"))
+    with patch("file_upload.job_store", store), patch(
+        "file_upload.process_document", return_value="Compliance Report"
+    ) as mock_process:
+        with open("tests/sample.docx", "rb") as file:
+            response = client.post(
+                "/jobs",
+                files={
+                    "file": (
+                        "sample.docx",
+                        file,
+                        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                    )
+                },
+            )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(50):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] == "done":
+                break
+            time.sleep(0.05)
+
+    assert job["status"] == "done"
+    assert job["result"] == "Compliance Report"
+    with open("tests/sample.docx", "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    mock_process.assert_called_once_with(isolated_upload_store.path(digest), False)
+
+
+def test_upload_deduplicates_content(isolated_upload_store):
+    """Test that identical uploads are stored once under their content hash"""
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    hashes = []
+    for name in ("first.docx", "second.docx"):
+        with open("tests/sample.docx", "rb") as file:
+            response = client.post("/upload", files={"file": (name, file, docx)})
+        assert response.status_code == 200
+        hashes.append(response.json()["sha256"])
+
+    assert hashes[0] == hashes[1]
+    assert isolated_upload_store.path(hashes[0]).endswith(f"{hashes[0]}.docx")
+    assert len(os.listdir(isolated_upload_store.object_dir)) == 1
+
+
+def test_same_filename_uploads_stay_separate(isolated_upload_store):
+    """Test that two different files uploaded under one name are each analyzed as their own"""
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    hashes = []
+    with open("tests/sample.docx", "rb") as file:
+        contents = (file.read(), b"PK other contract bytes")
+    for content in contents:
+        response = client.post("/upload", files={"file": ("contract.docx", content, docx)})
+        hashes.append(response.json()["sha256"])
+
+    def tokens(file_path, modify):
+        yield f"{os.path.getsize(file_path)} bytes"
+
+    with patch("file_upload.stream_document", side_effect=tokens):
+        first = client.get(f"/analyze/{hashes[0]}/stream")
+        second = client.get(f"/analyze/{hashes[1]}/stream")
+
+    assert hashes[0] != hashes[1]
+    assert f'"{os.path.getsize("tests/sample.docx")} bytes"' in first.text
+    assert '"23 bytes"' in second.text
+
+
+def test_upload_too_large(isolated_upload_store):
+    """Test that uploads over the size limit are rejected without leaving partial files"""
+    isolated_upload_store.max_bytes = 1024
+    response = client.post(
+        "/upload", files={"file": ("big.pdf", b"%PDF" + b"0" * 4096, "application/pdf")}
+    )
+
+    assert response.status_code == 413
+    assert os.listdir(isolated_upload_store.object_dir) == []
+
+
+def test_get_unknown_job():
+    """Test polling a job id that doesn't exist"""
+    response = client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+@patch("agents.get_document_text", return_value="Sample extracted text")
+def test_process_document_reuses_cached_llm_replies(mock_text_extraction, isolated_llm_cache):
+    """Test that byte-identical prompts are answered from the response cache"""
+    mock_agent = MagicMock()
+    mock_agent.system_message = "System message"
+    mock_agent.generate_reply.return_value = "Compliance Report"
+    with patch(
+        "agents.create_agents", return_value=(None, mock_agent, mock_agent, mock_agent)
+    ), patch("agents.INCREMENTAL_RECHECK", False), patch("agents.verdict_cache.enabled", False):
+        first = process_document("test/sample.docx")
+        calls = mock_agent.generate_reply.call_count
+        second = process_document("test/sample.docx")
+
+    assert first == second == "Compliance Report"
+    assert mock_agent.generate_reply.call_count == calls
+    assert isolated_llm_cache.stats()["hits"] == 2
+
+
+def test_check_document_only_reanalyzes_changed_sentences():
+    """Test that a revised version only sends new or edited sentences to the checker"""
+    prompts = []
+
+    def analyze(messages):
+        document = messages[0]["content"].split("Document:")[-1].strip()
+        prompts.append(document)
+        return "".join(
+            f'**Sentence:** "{sentence}"\n- **Issue:** flagged\n---\n'
+            for sentence in document.splitlines()
+        )
+
+    agent = MagicMock()
+    agent.system_message = "System message"
+    agent.generate_reply.side_effect = analyze
+
+    first = check_document(agent, "He go to school. The sky is blue.\nWe was late.")
+    second = check_document(agent, "He go to school. The sky are blue.\nWe was late.")
+
+    assert prompts[1] == "The sky are blue."
+    assert first.count("**Sentence:**") == second.count("**Sentence:**") == 3
+    assert second.index("He go to school.") < second.index("The sky are blue.")
+    assert second.index("The sky are blue.") < second.index("We was late.")
+
+
+def test_check_document_does_not_store_an_empty_reply_as_clean(isolated_llm_cache):
+    """Test that an empty reply isn't kept as a revision, so the next check asks again"""
+    text = "He go to school.\nWe was late."
+    replies = iter(
+        [
+            None,
+            '**Sentence:** "He go to school."\n- **Issue:** flagged\n---\n'
+            '**Sentence:** "We was late."\n- **Issue:** flagged\n---\n',
+        ]
+    )
+    agent = MagicMock()
+    agent.system_message = "System message"
+    agent.generate_reply.side_effect = lambda messages: next(replies)
+    isolated_llm_cache.enabled = False
+
+    assert check_document(agent, text) == ""
+    result = check_document(agent, text)
+
+    assert agent.generate_reply.call_count == 2
+    assert result.count("**Issue:** flagged") == 2
+
+
+def test_revision_store_scopes_versions_and_evicts(tmp_path):
+    """Test that prior versions are only matched within a scope and when mostly shared"""
+    store = RevisionStore(db_path=str(tmp_path / "revisions.db"), max_versions=2)
+    store.save_version("model-a", "v1", ["s1", "s2", "s3", "s4"], ["", "x", "", ""])
+
+    assert store.closest_version("model-a", ["s1", "s2", "s3", "s5"]) == "v1"
+    assert store.findings("model-a", "v1")["s2"] == "x"
+    assert store.closest_version("model-b", ["s1", "s2", "s3", "s5"]) is None
+    # One shared boilerplate sentence doesn't make an unrelated document a revision
+    assert store.closest_version("model-a", ["s1", "t2", "t3", "t4"]) is None
+
+    store.save_version("model-a", "v2", ["t1"], [""])
+    store.save_version("model-a", "v3", ["u1"], [""])
+    assert store.closest_version("model-a", ["s1", "s2", "s3", "s4"]) is None
+    assert store.findings("model-a", "v1") == {}
+
+
+def test_check_document_reuses_verdicts_across_documents(isolated_verdict_cache):
+    """Test that boilerplate judged in one document isn't sent again for another"""
+    prompts = []
+
+    def analyze(messages):
+        document = messages[0]["content"].split("Document:")[-1].strip()
+        prompts.append(document)
+        return "".join(
+            f'**Sentence:** "{sentence}"\n- **Issue:** flagged\n---\n'
+            for sentence in document.splitlines()
+        )
+
+    agent = MagicMock()
+    agent.system_message = "System message"
+    agent.generate_reply.side_effect = analyze
+    boilerplate = "This agreement are governed by the laws of the state."
+
+    with patch("agents.INCREMENTAL_RECHECK", False):
+        check_document(agent, f"We was late.\n{boilerplate}")
+        stats = {}
+        result = check_document(agent, f"{boilerplate}\nThey goes home.", stats=stats)
+
+    assert prompts[1] == "They goes home."
+    assert result.index(boilerplate) < result.index("They goes home.")
+    assert result.count("**Issue:** flagged") == 2
+    assert stats["verdict_cache_hits"] == 1 and stats["verdict_cache_hit_rate"] == 0.5
+    assert stats["tokens_saved"] > 0
+    assert isolated_verdict_cache.stats()["tokens_saved"] == stats["tokens_saved"]
+
+    # A different checker prompt doesn't reuse verdicts judged under the old one
+    agent.system_message = "Stricter system message"
+    with patch("agents.INCREMENTAL_RECHECK", False):
+        check_document(agent, f"{boilerplate}\nThey goes home.")
+    assert boilerplate in prompts[2]
+
+
+def test_check_document_caches_only_verdicts_the_reply_clearly_gave(
+    isolated_verdict_cache, isolated_llm_cache
+):
+    """Test that positional fallbacks and verdicts after a cut-off reply aren't cached"""
+    first, second, third = "We was late.", "They goes home.", "He do not agree."
+    replies = iter(
+        [
+            "No issues found.",
+            f'**Sentence:** "{second}"\n- **Issue:** flagged\n---\n',
+        ]
+    )
+    prompts = []
+
+    def analyze(messages):
+        prompts.append(messages[0]["content"].split("Document:")[-1].strip())
+        return next(replies, "")
+
+    agent = MagicMock()
+    agent.system_message = "System message"
+    agent.generate_reply.side_effect = analyze
+    text = f"{first}\n{second}\n{third}"
+    isolated_llm_cache.enabled = False
+
+    with patch("agents.INCREMENTAL_RECHECK", False):
+        check_document(agent, text)
+        check_document(agent, text)
+        check_document(agent, text)
+
+    # The quote-less reply was pinned to the first sentence, so nothing was cached
+    assert prompts[1] == text
+    # Then only the quoted sentence and the "no issue" before it were cached;
+    # the last sentence may just be where the reply stopped
+    assert prompts[2] == third
+    assert isolated_verdict_cache.stats()["entries"] == 2
+
+
+def test_prescreen_flags_rule_violations_and_clears_simple_sentences():
+    """Test the local pre-screen on clean and rule-breaking sentences"""
+    sentences = [
+        "The committee approved the annual budget on Monday.",
+        "The the report is late.",
+        "This is wrong ,and badly spaced.",
+        "we start in lowercase here.",
+        "They was late to the meeting yesterday.",
+    ]
+    needs_llm, results, stats = prescreen(sentences, mode="filter")
+
+    assert needs_llm == [False, True, True, True, True]
+    assert "repeated word" in results[1]["flags"]
+    assert "space before punctuation" in results[2]["flags"]
+    assert "lowercase sentence start" in results[3]["flags"]
+    assert "subject-verb agreement" in results[4]["flags"]
+    assert stats["screened_out"] == 1 and stats["sent_to_llm"] == 4
+
+    needs_llm, _, stats = prescreen(sentences, mode="report")
+    assert all(needs_llm)
+    assert stats["screened_out"] == 1
+
+
+def test_check_document_skips_prescreened_sentences():
+    """Test that sentences cleared by the pre-screen never reach the LLM"""
+    agent = MagicMock()
+    agent.system_message = "System message"
+    agent.generate_reply.return_value = '**Sentence:** "The the report is late."\n- **Issue:** repeated word\n---'
+    stats = {}
+
+    with patch("prescreen.PRESCREEN_MODE", "filter"):
+        result = check_document(
+            agent,
+            "The committee approved the annual budget on Monday. The the report is late.",
+            stats=stats,
+        )
+
+    prompt = agent.generate_reply.call_args.kwargs["messages"][0]["content"]
+    assert "The committee approved" not in prompt
+    assert "The the report is late." in result
+    assert stats["prescreen"]["screened_out"] == 1
+    assert stats["sent_to_llm"] == 1
+
+
+def test_llm_cache_expires_and_evicts(tmp_path):
+    """Test TTL expiry and size-bounded eviction of cached replies"""
+    cache = LLMCache(db_path=str(tmp_path / "llm.db"), ttl=3600, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, f"reply {key}")
+    assert cache.stats()["entries"] == 2
+    assert cache.get("c") == "reply c"
+
+    cache.ttl = -1
+    assert cache.get("c") is None
+
+
+def test_stream_analysis_sends_tokens_as_events():
+    """Test that report tokens are relayed as server-sent events"""
+    def tokens(file_path, modify):
+        yield "Compliance "
+        yield "Report"
+
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    with open("tests/sample.docx", "rb") as file:
+        sha256 = client.post("/upload", files={"file": ("sample.docx", file, docx)}).json()["sha256"]
+    with patch("file_upload.stream_document", side_effect=tokens):
+        response = client.get(f"/analyze/{sha256}/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'data: {"token": "Compliance "}' in response.text
+    assert 'data: {"token": "Report"}' in response.text
+    assert response.text.rstrip().endswith("event: done\ndata: {}")
+
+
+def test_stream_generate_caches_completed_replies(isolated_llm_cache):
+    """Test that streamed replies are yielded piecewise and cached once complete"""
+    def chunk(content):
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=content))])
+
+    stream = MagicMock()
+    stream.__iter__.return_value = iter([chunk("Compliance "), chunk(None), chunk("Report")])
+    agent = MagicMock()
+    agent.system_message = "System message"
+
+    with patch("agents.OpenAI") as mock_openai:
+        mock_openai.return_value.chat.completions.create.return_value = stream
+        assert list(stream_generate(agent, "prompt")) == ["Compliance ", "Report"]
+        assert list(stream_generate(agent, "prompt")) == ["Compliance Report"]
+
+    stream.close.assert_called_once()
+    assert mock_openai.return_value.chat.completions.create.call_count == 1
+
+    # The same model behind another endpoint (e.g. the load-test stub) shares no cached replies or verdicts
+    scope = verdict_scope(agent)
+    with patch.dict("agents.llm_config", {"base_url": "http://127.0.0.1:8001/v1"}), patch(
+        "agents.OpenAI"
+    ) as stub_openai:
+        stub_stream = MagicMock()
+        stub_stream.__iter__.return_value = iter([chunk("Stub")])
+        stub_openai.return_value.chat.completions.create.return_value = stub_stream
+        assert list(stream_generate(agent, "prompt")) == ["Stub"]
+        assert verdict_scope(agent) != scope
+
+
+def test_stream_analysis_unknown_file():
+    """Test streaming the analysis of a file that was never uploaded"""
+    assert client.get(f"/analyze/{'0' * 64}/stream").status_code == 404
+    assert client.get("/analyze/sample.docx/stream").status_code == 404
+
+
+@patch("agents.get_document_text", return_value="Sample extracted text")
+def test_process_document_modify_skips_check_and_report(mock_text_extraction):
+    """Test that modify mode only runs the extraction and rewrite stages"""
+    compliance_agent = MagicMock(system_message="check")
+    report_agent = MagicMock(system_message="report")
+    rewrite_agent = MagicMock(system_message="rewrite")
+    rewrite_agent.generate_reply.return_value = "Rewritten text"
+    with patch(
+        "agents.create_agents",
+        return_value=(None, compliance_agent, report_agent, rewrite_agent),
+    ):
+        result = process_document("test/sample.docx", modify=True)
+
+    assert result == "Rewritten text"
+    compliance_agent.generate_reply.assert_not_called()
+    report_agent.generate_reply.assert_not_called()
+
+
+def test_pipeline_reuses_session_outputs_and_runs_independent_stages_in_parallel():
+    """Test that stages run once per session and independent stages overlap"""
+    import time
+
+    calls = []
+
+    def slow(name, value):
+        def run(inputs):
+            calls.append(name)
+            time.sleep(0.2)
+            return value
+
+        return run
+
+    pipeline = Pipeline(
+        [
+            Stage("extract", slow("extract", "text")),
+            Stage("report", slow("report", "report"), deps=["extract"]),
+            Stage("rewrite", slow("rewrite", "rewrite"), deps=["extract"]),
+        ]
+    )
+    session = PipelineSession()
+
+    start = time.perf_counter()
+    outputs = pipeline.run(["report", "rewrite"], session=session, doc_key="doc")
+    elapsed = time.perf_counter() - start
+    assert outputs["report"] == "report" and outputs["rewrite"] == "rewrite"
+    assert elapsed < 0.55
+
+    pipeline.run(["rewrite"], session=session, doc_key="doc")
+    assert sorted(calls) == ["extract", "report", "rewrite"]
+
+
+def test_agent_registry_shares_agents_and_http_client():
+    """Test that agents are built once and all use the same pooled HTTP client"""
+    registry = AgentRegistry(
+        {"model": "test-model", "api_key": "test-key", "base_url": "http://127.0.0.1:9/v1"}
+    )
+    agents = registry.agents()
+
+    assert registry.agents() is agents
+    assert [agent.name for agent in agents] == [
+        "DocumentParser",
+        "ComplianceChecker",
+        "ReportGenerator",
+        "RewriteAgent",
+    ]
+    for agent in agents:
+        assert agent.client._clients[0]._oai_client._client is registry.http_client
+
+
+def test_pooled_http_client_counts_connection_reuse():
+    """Test that keep-alive connections are reused and counted"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    registry = AgentRegistry({"model": "test-model", "api_key": "test-key"})
+    try:
+        for _ in range(3):
+            registry.http_client.get(f"http://127.0.0.1:{server.server_port}/")
+    finally:
+        registry.http_client.close()
+        server.shutdown()
+
+    assert registry.http_client.stats() == {
+        "requests": 3,
+        "connections_opened": 1,
+        "connections_reused": 2,
+    }
+
+
+def test_llm_scheduler_holds_calls_within_the_request_budget():
+    """Test that calls beyond the rolling request budget wait for the window to move"""
+    import time
+
+    scheduler = LLMScheduler(
+        requests_per_minute=2, tokens_per_minute=100000, headroom=1, window=0.3
+    )
+    start = time.perf_counter()
+    for _ in range(3):
+        scheduler.call(lambda: None, prompt_tokens=10)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed >= 0.29
+    assert scheduler.stats()["dispatched"] == 3
+
+
+def test_llm_scheduler_interleaves_documents_fairly():
+    """Test that queued calls are admitted round-robin across documents"""
+    import threading
+    import time
+
+    scheduler = LLMScheduler(
+        requests_per_minute=1, tokens_per_minute=100000, headroom=1, window=0.1
+    )
+    scheduler.call(lambda: None, prompt_tokens=1, key="warmup")
+    order = []
+    threads = []
+    for key, name in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]:
+        thread = threading.Thread(
+            target=scheduler.call,
+            args=(lambda name=name: order.append(name), 1, key),
+        )
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_llm_scheduler_retries_rate_limited_calls():
+    """Test that 429 responses are retried with backoff"""
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "reply"
+
+    scheduler = LLMScheduler(backoff_base=0.01)
+    assert scheduler.call(flaky, prompt_tokens=10) == "reply"
+    assert scheduler.stats()["rate_limited"] == 2
+
+    with pytest.raises(ValueError):
+        scheduler.call(lambda: (_ for _ in ()).throw(ValueError("boom")), 10)
+
+
+def test_run_batch_resumes_and_skips_processed_content(tmp_path):
+    """Test that batch runs write JSONL records and skip already processed content"""
+    import json
+    import shutil
+
+    docs = tmp_path / "docs"
+    (docs / "nested").mkdir(parents=True)
+    shutil.copy("tests/sample.docx", docs / "a.docx")
+    shutil.copy("tests/sample.docx", docs / "nested" / "copy_of_a.docx")
+    shutil.copy("tests/sample.txt", docs / "notes.txt")
+    output = tmp_path / "results.jsonl"
+
+    with patch("batch_cli.get_document_text", return_value="text"), patch(
+        "batch_cli.process_document", return_value="Compliance Report"
+    ) as mock_process:
+        first = run_batch([str(docs)], str(output), workers=2)
+        second = run_batch([str(docs)], str(output), workers=2)
+        rewrite = run_batch([str(docs)], str(output), workers=2, modify=True)
+
+    assert first == {"processed": 1, "failed": 0, "skipped": 1}
+    assert second == {"processed": 0, "failed": 0, "skipped": 2}
+    # Rewriting is a different output, so the report run's checkpoint doesn't skip it
+    assert rewrite == {"processed": 1, "failed": 0, "skipped": 1}
+    assert mock_process.call_count == 2
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(records) == 2 and records[1]["modify"]
+    assert records[0]["status"] == "ok"
+    assert records[0]["result"] == "Compliance Report"
+    assert "total_seconds" in records[0]["timings"]
+
+
 def test_process_file_not_found():
     """Test processing a non-existent file"""
     with pytest.raises(FileNotFoundError):
@@ -74,10 +803,237 @@ def test_process_file(mock_process_document):
     assert result["sample.docx"] == "Compliance Report"
 
 
+def test_extraction_cache_reuses_text_for_identical_bytes(tmp_path):
+    """Test that identical file contents are extracted only once, whatever their name"""
+    first = tmp_path / "first.docx"
+    second = tmp_path / "second.docx"
+    with open("tests/sample.docx", "rb") as file:
+        data = file.read()
+    first.write_bytes(data)
+    second.write_bytes(data)
+
+    cache = ExtractionCache(cache_dir=str(tmp_path / "cache"))
+    with patch("extractors.extraction_cache", cache), patch(
+        "extractors._extract_text", return_value="Cached text"
+    ) as mock_extract:
+        assert get_document_text(str(first)) == "Cached text"
+        assert get_document_text(str(second)) == "Cached text"
+
+    assert mock_extract.call_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_extraction_cache_evicts_least_recently_used(tmp_path):
+    """Test that the extraction cache stays within its size budget"""
+    cache = ExtractionCache(cache_dir=str(tmp_path), max_bytes=10)
+    cache.put("old", "1", "aaaaaa")
+    os.utime(tmp_path / "old-1.txt", (0, 0))
+    cache.put("new", "1", "bbbbbb")
+
+    assert cache.get("old", "1") is None
+    assert cache.get("new", "1") == "bbbbbb"
+
+    cache.invalidate("new")
+    assert cache.get("new", "1") is None
+
+
+def test_ocr_engine_loads_models_once():
+    """Test that the OCR reader is constructed once and reused across pages"""
+    mock_easyocr = MagicMock()
+    mock_easyocr.Reader.return_value.readtext.return_value = ["line one", "line two"]
+    with patch.dict(sys.modules, {"easyocr": mock_easyocr}):
+        engine = OCREngine(languages=["en"])
+        engine.warm_up(background=False)
+        assert engine.read_text("page-1") == ["line one", "line two"]
+        assert engine.read_text("page-2") == ["line one", "line two"]
+
+    assert mock_easyocr.Reader.call_count == 1
+    stats = engine.stats()
+    assert stats["loaded"] is True
+    assert stats["pages_processed"] == 2
+
+
+def test_ocr_engine_batches_pages_of_the_same_size():
+    """Test that same-sized pages share one batched inference call"""
+    import numpy as np
+
+    mock_easyocr = MagicMock()
+    reader = mock_easyocr.Reader.return_value
+    reader.readtext_batched.return_value = [["page one"], ["page two"]]
+    reader.readtext.return_value = ["odd page"]
+    pages = [np.zeros((20, 10)), np.zeros((30, 10)), np.zeros((20, 10))]
+
+    with patch.dict(sys.modules, {"easyocr": mock_easyocr}):
+        result = OCREngine(languages=["en"]).read_text_batch(pages)
+
+    assert result == [["page one"], ["odd page"], ["page two"]]
+    assert reader.readtext_batched.call_count == 1
+
+
+def test_ocr_worker_pool_is_reused_across_documents():
+    """Test that multi-worker OCR reuses one pool whose workers load their reader at start"""
+    pool = OCRWorkerPool(workers=2)
+    with patch("ocr_engine.ProcessPoolExecutor") as executor, patch("ocr_engine.ocr_pool", pool):
+        executor.return_value.map.side_effect = lambda func, paths, windows: [
+            {window[0]: f"{path} page {window[0]}"} for path, window in zip(paths, windows)
+        ]
+        first = ocr_pdf_pages("a.pdf", [1, 3], workers=2)
+        second = ocr_pdf_pages("b.pdf", [2, 5], workers=2)
+        pool.shutdown()
+
+    assert first == {1: "a.pdf page 1", 3: "a.pdf page 3"}
+    assert second == {2: "b.pdf page 2", 5: "b.pdf page 5"}
+    assert executor.call_count == 1
+    assert executor.call_args.kwargs["initializer"] is load_worker_reader
+    executor.return_value.shutdown.assert_called_once()
+
+
+def test_page_windows_split_on_gaps_and_size():
+    """Test that OCR render windows hold consecutive pages up to the batch size"""
+    assert page_windows([1, 2, 3, 4, 5, 9, 10, 12], size=3) == [
+        [1, 2, 3],
+        [4, 5],
+        [9, 10],
+        [12],
+    ]
+
+
+def _write_pdf(path, pages):
+    """Writes a PDF with one page per entry; None produces a page with no text layer."""
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(str(path))
+    for text in pages:
+        if text:
+            pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+
+
+def test_extract_text_from_pdf_ocrs_only_scanned_pages(tmp_path):
+    """Test that only pages without a usable text layer are sent to OCR"""
+    pdf_path = tmp_path / "mixed.pdf"
+    _write_pdf(
+        pdf_path,
+        ["The first page has a proper text layer.", None, "The third page is digital too."],
+    )
+
+    with patch(
+        "extractors.ocr_pdf_pages", return_value={2: "Scanned second page"}
+    ) as mock_ocr:
+        text = extract_text_from_pdf(str(pdf_path), backend="pypdf")
+
+    mock_ocr.assert_called_once_with(str(pdf_path), [2])
+    assert text.split("\n") == [
+        "The first page has a proper text layer.",
+        "Scanned second page",
+        "The third page is digital too.",
+    ]
+
+
+def test_auto_pdf_extractor_falls_back_to_next_backend(tmp_path):
+    """Test that auto mode skips backends that fail and uses the next one with text"""
+    pdf_path = tmp_path / "digital.pdf"
+    _write_pdf(pdf_path, ["A digital page with a readable text layer."])
+
+    with patch.dict(
+        EXTRACTORS[".pdf"], {"pymupdf": MagicMock(side_effect=ImportError)}
+    ), patch("extractors.AUTO_PDF_ORDER", ["pymupdf", "pypdf", "ocr"]):
+        text = extract_text_from_pdf(str(pdf_path), backend="auto")
+
+    assert text == "A digital page with a readable text layer."
+
+
+def test_auto_pdf_extractor_raises_instead_of_returning_no_text(tmp_path):
+    """Test that a corrupt PDF or failed OCR raises and leaves nothing in the extraction cache"""
+    corrupt = tmp_path / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.4 not really a pdf")
+    scanned = tmp_path / "scanned.pdf"
+    write_scanned_pdf(str(scanned), 1)
+    cache = ExtractionCache(cache_dir=str(tmp_path / "cache"))
+
+    with patch("extractors.extraction_cache", cache), patch(
+        "extractors.PDF_EXTRACTOR", "auto"
+    ), patch("extractors.AUTO_PDF_ORDER", ["pypdf", "ocr"]), patch(
+        "extractors.ocr_pdf_pages", side_effect=RuntimeError("OCR unavailable")
+    ):
+        with pytest.raises(Exception):
+            get_document_text(str(corrupt))
+        with pytest.raises(RuntimeError, match="OCR unavailable"):
+            get_document_text(str(scanned))
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_benchmark_extractors_reports_throughput(tmp_path):
+    """Test that the extractor benchmark measures every PDF backend"""
+    pdf_path = tmp_path / "digital.pdf"
+    _write_pdf(pdf_path, ["Page one of the benchmark.", "Page two of the benchmark."])
+
+    with patch.dict(EXTRACTORS[".pdf"], {"ocr": MagicMock(side_effect=RuntimeError)}):
+        results = benchmark_extractors([str(pdf_path)], repeat=1)
+
+    by_backend = {row["backend"]: row for row in results}
+    assert by_backend["pypdf"]["pages"] == 2
+    assert by_backend["pymupdf"]["pages_per_second"] > 0
+    assert "error" in by_backend["ocr"]
+
+
+def test_chunk_sentences_respects_token_budget():
+    """Test that chunks are sentence-aligned and stay within the token budget"""
+    text = "First sentence here. Second one follows!\nThird line? Fourth sentence."
+    sentences = split_sentences(text)
+    assert sentences == [
+        "First sentence here.",
+        "Second one follows!",
+        "Third line?",
+        "Fourth sentence.",
+    ]
+    assert chunk_sentences(sentences, max_tokens=12) == [
+        "First sentence here. Second one follows!",
+        "Third line? Fourth sentence.",
+    ]
+
+
+def test_split_findings_drops_preamble():
+    """Test that per-sentence blocks are separated from model chatter"""
+    response = 'Here is the analysis:\n---\n**Sentence:** "A."\n- **Issue:** x\n---\n**Sentence:** "B."\n- **Issue:** y\n---'
+    assert split_findings(response) == [
+        '**Sentence:** "A."\n- **Issue:** x',
+        '**Sentence:** "B."\n- **Issue:** y',
+    ]
+
+
+def test_run_compliance_check_analyzes_chunks_concurrently():
+    """Test that long documents are analyzed chunk by chunk in parallel and merged in order"""
+    import time
+
+    def slow_reply(messages):
+        time.sleep(0.2)
+        chunk = messages[0]["content"].split("Document:")[-1].strip()
+        return f'**Sentence:** "{chunk}"\n- **Issue:** checked\n---'
+
+    agent = MagicMock()
+    agent.generate_reply.side_effect = slow_reply
+    text = " ".join(f"Sentence number {i} is here." for i in range(8))
+
+    with patch("agents.CHUNK_TOKEN_BUDGET", 16), patch("agents.ANALYSIS_CONCURRENCY", 8):
+        start = time.perf_counter()
+        result = run_compliance_check(agent, text)
+        elapsed = time.perf_counter() - start
+
+    assert agent.generate_reply.call_count == 4
+    assert elapsed < 0.6
+    positions = [result.index(f"Sentence number {i} ") for i in range(8)]
+    assert positions == sorted(positions)
+
+
 @pytest.mark.performance
-def test_large_file_upload():
+def test_large_file_upload(tmp_path):
     """Test uploading a large file for performance validation"""
-    file_path = "tests/large_sample.pdf"
+    file_path = tmp_path / "large_sample.pdf"
+    write_text_pdf(file_path, pages=300)
     with open(file_path, "rb") as file:
         response = client.post(
             "/upload", files={"file": ("large_sample.pdf", file, "application/pdf")}
@@ -85,3 +1041,489 @@ def test_large_file_upload():
 
     assert response.status_code == 200
     assert "File uploaded successfully" in response.json()["message"]
+
+
+@pytest.mark.performance
+def test_benchmark_suite_records_baseline(tmp_path):
+    """Test that the benchmark suite measures synthetic corpora with the fake LLM"""
+    report = run_benchmarks(
+        str(tmp_path), kinds=("docx", "pdf"), sizes=(1, 3), runs=3, latency=0.001
+    )
+
+    assert set(report["results"]) == {"docx-1p", "docx-3p", "pdf-1p", "pdf-3p"}
+    row = report["results"]["pdf-3p"]
+    assert row["pages_per_second"] > 0 and row["mb_per_second"] > 0
+    assert set(row["latency_seconds"]) == {"p50", "p95", "p99"}
+    assert row["peak_rss_mb"] > 0 and "child_peak_rss_mb" in row
+    assert compare_to_baseline(report, report) == []
+
+    slower = json.loads(json.dumps(report))
+    slower["results"]["pdf-3p"]["latency_seconds"]["p95"] *= 10
+    assert compare_to_baseline(slower, report)
+
+
+def test_patch_docx_keeps_original_formatting(tmp_path):
+    """Test that rewritten text is written into the original paragraphs and their styles"""
+    from docx import Document
+
+    original = Document()
+    original.add_heading("Policy draft", level=1)
+    body = original.add_paragraph()
+    body.add_run("Employees ").bold = True
+    body.add_run("is required to report incidents.")
+    original.add_paragraph("")
+    original.add_paragraph("Managers reviews records.", style="List Bullet")
+    path = tmp_path / "policy.docx"
+    original.save(path)
+
+    buffer = patch_docx(
+        str(path),
+        "Policy Draft\nEmployees are required to report incidents.\n\n"
+        "Managers review records.\nRecords are kept for five years.",
+    )
+    patched = [p for p in Document(buffer).paragraphs if p.text]
+
+    assert [p.text for p in patched] == [
+        "Policy Draft",
+        "Employees are required to report incidents.",
+        "Managers review records.",
+        "Records are kept for five years.",
+    ]
+    assert [p.style.name for p in patched] == [
+        "Heading 1",
+        "Normal",
+        "List Bullet",
+        "List Bullet",
+    ]
+    assert patched[1].runs[0].bold
+
+
+def test_patch_docx_aligns_dropped_and_added_paragraphs(tmp_path):
+    """Test that a rewrite dropping or adding a line doesn't shift later paragraphs"""
+    from docx import Document
+
+    original = Document()
+    original.add_heading("Leave policy", level=1)
+    original.add_paragraph("Employees is entitled to twenty days of leave.")
+    original.add_paragraph("Leave must be requested in advance.")
+    original.add_heading("Sick leave", level=2)
+    original.add_paragraph("Sick leave are paid in full.", style="List Bullet")
+    path = tmp_path / "leave.docx"
+    original.save(path)
+
+    buffer = patch_docx(
+        str(path),
+        "Leave Policy\nEmployees are entitled to twenty days of leave.\n"
+        "Sick leave\nA doctor's note is needed after three days.\nSick leave is paid in full.",
+    )
+    patched = [(p.text, p.style.name) for p in Document(buffer).paragraphs if p.text]
+
+    assert patched == [
+        ("Leave Policy", "Heading 1"),
+        ("Employees are entitled to twenty days of leave.", "Normal"),
+        ("Sick leave", "Heading 2"),
+        ("A doctor's note is needed after three days.", "Heading 2"),
+        ("Sick leave is paid in full.", "List Bullet"),
+    ]
+    # A paragraph rewritten without a word in common still keeps its place
+    originals = ["Intro.", "TEXTBOX CLAUSE", "End."]
+    rewritten = ["Intro!", "Text box clause", "End!"]
+    assert align_paragraphs(originals, rewritten) == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_render_pdf_in_memory_paragraph_per_flowable():
+    """Test that long rewrites render to an in-memory PDF, markup characters included"""
+    text = "\n".join(f"Clause {n} covers R&D <costs> and more." for n in range(2000))
+    buffer, name, mime = build_modified_document(text, "contract.pdf")
+
+    assert name == "modified_contract.pdf" and mime == "application/pdf"
+    reader = PdfReader(buffer)
+    assert len(reader.pages) > 10
+    assert "Clause 1999 covers R&D <costs>" in reader.pages[-1].extract_text()
+
+
+def _write_docx_with_everything(path):
+    """Writes a DOCX with a header, body text, a table, a footer and a footnote."""
+    import zipfile
+    from docx import Document
+
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Confidential"
+    doc.add_paragraph("The supplier shall deliver the goods.")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Penalty"
+    table.cell(0, 1).text = "Two percent per day"
+    doc.add_paragraph("Payment is due within thirty days.")
+    doc.sections[0].footer.paragraphs[0].text = "Page footer"
+    doc.save(path)
+
+    w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    footnotes = (
+        f'<w:footnotes xmlns:w="{w}">'
+        '<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>'
+        '<w:footnote w:id="1"><w:p><w:r><w:t>Subject to local law.</w:t></w:r></w:p></w:footnote>'
+        "</w:footnotes>"
+    )
+    with zipfile.ZipFile(path) as archive:
+        entries = {name: archive.read(name) for name in archive.namelist()}
+    entries["word/footnotes.xml"] = footnotes.encode()
+    entries["[Content_Types].xml"] = entries["[Content_Types].xml"].replace(
+        b"</Types>",
+        b'<Override PartName="/word/footnotes.xml" ContentType="application/'
+        b'vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"/></Types>',
+    )
+    entries["word/_rels/document.xml.rels"] = entries["word/_rels/document.xml.rels"].replace(
+        b"</Relationships>",
+        b'<Relationship Id="rIdFootnotes" Type="http://schemas.openxmlformats.org/'
+        b'officeDocument/2006/relationships/footnotes" Target="footnotes.xml"/></Relationships>',
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+
+
+def test_stream_docx_extractor_reads_every_part_in_order(tmp_path):
+    """Test that the streaming DOCX backend includes headers, tables, footers and notes"""
+    path = tmp_path / "contract.docx"
+    _write_docx_with_everything(path)
+
+    streamed = EXTRACTORS[".docx"]["stream"](str(path))[0].split("\n")
+    legacy = EXTRACTORS[".docx"]["python-docx"](str(path))[0]
+
+    assert streamed == [
+        "Confidential",
+        "The supplier shall deliver the goods.",
+        "Penalty",
+        "Two percent per day",
+        "Payment is due within thirty days.",
+        "Page footer",
+        "Subject to local law.",
+    ]
+    assert "Penalty" not in legacy
+    assert get_document_text(str(path)).split("\n") == streamed
+
+
+def test_text_boxes_are_read_and_patched_once(tmp_path):
+    """Test that a text box's mc:Fallback copy is neither extracted nor patched"""
+    from docx import Document
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import qn
+
+    doc = Document()
+    doc.add_paragraph("The supplier shall deliver the goods.")
+    holder = doc.add_paragraph()
+    doc.add_paragraph("Payment is due within thirty days.")
+    box = '<w:txbxContent><w:p><w:r><w:t>TEXTBOX CLAUSE</w:t></w:r></w:p></w:txbxContent>'
+    holder._p.append(
+        parse_xml(
+            '<w:r xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+            ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+            ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+            ' xmlns:v="urn:schemas-microsoft-com:vml"><mc:AlternateContent>'
+            f'<mc:Choice Requires="wps"><w:drawing><wps:txbx>{box}</wps:txbx></w:drawing></mc:Choice>'
+            f"<mc:Fallback><w:pict><v:textbox>{box}</v:textbox></w:pict></mc:Fallback>"
+            "</mc:AlternateContent></w:r>"
+        )
+    )
+    path = tmp_path / "boxed.docx"
+    doc.save(path)
+
+    assert EXTRACTORS[".docx"]["stream"](str(path))[0].split("\n") == [
+        "The supplier shall deliver the goods.",
+        "TEXTBOX CLAUSE",
+        "Payment is due within thirty days.",
+    ]
+
+    buffer = patch_docx(
+        str(path),
+        "The supplier must deliver the goods.\nText box clause\nPayment is due in 30 days.",
+    )
+    patched = Document(buffer)
+    body = [p.text for p in patched.paragraphs if p.text]
+    assert body == ["The supplier must deliver the goods.", "Payment is due in 30 days."]
+    boxes = [
+        "".join(t.text for t in p.iter(qn("w:t")))
+        for p in patched.element.body.iter(qn("w:txbxContent"))
+    ]
+    assert boxes[0] == "Text box clause"
+
+
+def test_patch_docx_round_trips_tables_and_notes(tmp_path):
+    """Test that a rewrite lands in the same header, table cell and footnote it came from"""
+    path = tmp_path / "contract.docx"
+    _write_docx_with_everything(path)
+    rewrite = "\n".join(
+        [
+            "CONFIDENTIAL",
+            "The supplier must deliver the goods.",
+            "Late penalty",
+            "2% per day",
+            "Payment is due in 30 days.",
+            "Footer",
+            "Subject to applicable law.",
+        ]
+    )
+
+    patched = tmp_path / "patched.docx"
+    patched.write_bytes(patch_docx(str(path), rewrite).getvalue())
+
+    assert EXTRACTORS[".docx"]["stream"](str(patched))[0] == rewrite
+
+
+ANALYSIS = """**Sentence:** "The report were late."
+- **Issue:** Subject-verb agreement: "report" is singular.
+---
+**Sentence:** "We has reviewed the the contract."
+- **Issue:** Subject-verb agreement.
+- **Issue:** Repeated word "the".
+---"""
+
+
+def test_parse_findings():
+    """Test parsing the ComplianceChecker format into sentence, issue and score records"""
+    records = parse_findings(ANALYSIS + "\nNo other issues found.")
+
+    assert records == [
+        {
+            "sentence": "The report were late.",
+            "issue": 'Subject-verb agreement: "report" is singular.',
+            "score": 1.0,
+        },
+        {
+            "sentence": "We has reviewed the the contract.",
+            "issue": 'Subject-verb agreement.; Repeated word "the".',
+            "score": 2.0,
+        },
+    ]
+
+
+@patch(
+    "agents.get_document_text",
+    return_value="The report were late. We has reviewed the the contract.",
+)
+def test_findings_are_recorded_and_searchable(mock_text_extraction, isolated_findings_store):
+    """Test that analyses land in the findings store and can be searched page by page"""
+    compliance_agent = MagicMock(system_message="check")
+    compliance_agent.generate_reply.return_value = ANALYSIS
+    report_agent = MagicMock(system_message="report")
+    report_agent.generate_reply.return_value = "Compliance Report"
+    with patch(
+        "agents.create_agents",
+        return_value=(None, compliance_agent, report_agent, MagicMock()),
+    ):
+        process_document("tests/sample.docx")
+
+    documents = client.get("/findings/documents").json()
+    assert documents["total"] == 1 and documents["items"][0]["findings"] == 2
+    doc_hash = documents["items"][0]["doc_hash"]
+
+    page = client.get("/findings", params={"doc_hash": doc_hash, "page_size": 1}).json()
+    assert page["total"] == 2
+    assert [item["sentence"] for item in page["items"]] == ["The report were late."]
+
+    found = client.get("/findings", params={"q": "repeated"}).json()
+    assert [item["sentence"] for item in found["items"]] == [
+        "We has reviewed the the contract."
+    ]
+    assert client.get("/findings", params={"q": 'unmatched "quote'}).json()["total"] == 0
+
+
+def test_render_history_searches_a_findings_store(tmp_path):
+    """Test that the sidebar history works against FindingsStore's own signatures"""
+    from streamlit.testing.v1 import AppTest
+
+    def history(db_path):
+        from findings_store import FindingsStore
+        from ui_state import render_history
+
+        store = FindingsStore(db_path=db_path)
+        render_history(store.search, store.documents)
+
+    db_path = str(tmp_path / "findings.db")
+    FindingsStore(db_path=db_path).record("a" * 64, ANALYSIS, filename="contract.docx")
+
+    app = AppTest.from_function(history, args=(db_path,)).run()
+    assert app.selectbox[0].options == ["Select a document", "contract.docx (2 findings)"]
+    app.selectbox[0].select("contract.docx (2 findings)").run()
+    assert not app.exception and app.caption[0].value == "2 findings"
+
+    app.text_input[0].input("repeated").run()
+    assert not app.exception
+    assert app.caption[0].value == "1 findings"
+    assert "We has reviewed the the contract." in app.markdown[0].value
+
+
+def test_llm_stub_speaks_the_chat_completions_protocol():
+    """Test plain, streamed and rate-limited completions from the local LLM stub"""
+    import openai
+
+    prompt = "Perform a **sentence-by-sentence** compliance analysis.\nDocument:\nWe was late."
+    messages = [{"role": "user", "content": prompt}]
+    stub = TestClient(create_llm_stub(latency=0, tokens_per_second=0))
+    llm = openai.OpenAI(api_key="stub", base_url="http://testserver/v1", http_client=stub)
+
+    reply = llm.chat.completions.create(model="stub", messages=messages)
+    streamed = llm.chat.completions.create(model="stub", messages=messages, stream=True)
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in streamed)
+
+    assert reply.choices[0].message.content == text
+    assert '**Sentence:** "We was late."' in text and reply.usage.completion_tokens > 0
+
+    limited = TestClient(create_llm_stub(latency=0, rate_limit_rate=1.0, retry_after=2))
+    llm = openai.OpenAI(
+        api_key="stub", base_url="http://testserver/v1", http_client=limited, max_retries=0
+    )
+    with pytest.raises(openai.RateLimitError) as error:
+        llm.chat.completions.create(model="stub", messages=messages)
+    assert error.value.response.headers["retry-after"] == "2"
+    assert limited.get("/stats").json()["rate_limited"] == 1
+
+
+def test_load_test_reports_throughput_and_latency_percentiles(tmp_path):
+    """Test the load driver end to end against the API backed by the LLM stub"""
+    stub = TestClient(create_llm_stub(latency=0, tokens_per_second=0, reply_tokens=20))
+    stub_config = {"model": "stub", "api_key": "stub", "base_url": "http://testserver/v1"}
+    with patch("agents.create_agents", return_value=fake_agents(0)), patch.dict(
+        "agents.llm_config", stub_config
+    ), patch("agents.agent_registry.http_client", stub):
+        report = run_load_test(client, str(tmp_path), levels=[1, 2], requests=3)
+        with patch("file_upload.job_store", JobStore(db_path=str(tmp_path / "jobs.db"))):
+            jobs_report = run_load_test(
+                client, str(tmp_path), levels=[2], requests=3, mode="jobs", timeout=30
+            )
+
+    for level in report["levels"]:
+        assert level["completed"] == 3 and not level["errors"]
+        assert level["throughput"] > 0
+        assert set(level["latency_seconds"]["total"]) == {"p50", "p95", "p99"}
+        assert "first_token" in level["latency_seconds"]
+    jobs_level = jobs_report["levels"][0]
+    assert jobs_report["mode"] == "jobs"
+    assert jobs_level["completed"] == 3 and not jobs_level["errors"]
+    assert set(jobs_level["latency_seconds"]) == {"total"}
+    # The fake checker gives every document the same findings, so the report prompt repeats
+    assert stub.get("/stats").json()["completed"] >= 1
+
+    levels = [
+        {"clients": 1, "throughput": 2.0},
+        {"clients": 2, "throughput": 3.9},
+        {"clients": 4, "throughput": 4.0},
+    ]
+    assert saturation_point(levels) == 2
+
+
+def test_estimate_cost_weighs_pages_and_text_layer(tmp_path):
+    """Test that scanned pages cost more than text pages and cached text costs almost nothing"""
+    text_pdf, scanned_pdf = tmp_path / "text.pdf", tmp_path / "scanned.pdf"
+    write_text_pdf(text_pdf, 5)
+    write_scanned_pdf(scanned_pdf, 5)
+    cache = ExtractionCache(cache_dir=str(tmp_path / "extraction"))
+
+    with patch("admission.extraction_cache", cache):
+        text_cost = estimate_cost(str(text_pdf))
+        scanned_cost = estimate_cost(str(scanned_pdf))
+        docx_cost = estimate_cost("tests/sample.docx")
+        with patch("extractors.extraction_cache", cache), patch(
+            "extractors._extract_text", return_value="Scanned text"
+        ):
+            get_document_text(str(scanned_pdf))
+        cached_cost = estimate_cost(str(scanned_pdf))
+
+    assert 1 < docx_cost < text_cost < scanned_cost
+    assert scanned_cost > 5 * text_cost
+    assert cached_cost == 1.0
+
+
+def test_admission_lets_small_documents_overtake_large_ones():
+    """Test weighted admission order, queue limits and timeouts"""
+    controller = AdmissionController(capacity=10, max_queued_cost=20, aging_seconds=0)
+    running = controller.reserve(8)
+    large = controller.reserve(9)
+    small = controller.reserve(2)
+
+    assert running.event.is_set() and small.event.is_set() and not large.event.is_set()
+    with pytest.raises(AdmissionRejected) as error:
+        controller.reserve(15)
+    assert error.value.retry_after >= 1
+
+    controller.release(running)
+    assert not large.event.is_set()
+    controller.release(small)
+    controller.release(small)
+    assert large.event.is_set()
+    assert controller.stats()["in_flight_cost"] == 9
+
+    waiting = controller.reserve(5)
+    with pytest.raises(AdmissionRejected):
+        controller.wait(waiting, timeout=0.01)
+    stats = controller.stats()
+    assert stats["queued"] == 0 and stats["timed_out"] == 1 and stats["rejected"] == 1
+
+
+def test_upload_accepted_without_pre_extraction_when_at_capacity(isolated_admission_controller):
+    """Test that a full admission queue skips pre-extraction but still stores the upload"""
+    isolated_admission_controller.max_queued_cost = 0
+    isolated_admission_controller.reserve(isolated_admission_controller.capacity)
+    isolated_admission_controller.reserve(1)
+
+    with patch("file_upload.pre_extract") as pre_extract, open("tests/sample.docx", "rb") as file:
+        response = client.post(
+            "/upload",
+            files={
+                "file": (
+                    "sample.docx",
+                    file,
+                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                )
+            },
+        )
+
+    assert response.status_code == 200
+    pre_extract.assert_not_called()
+    assert client.get("/admission/stats").json()["rejected"] == 1
+
+
+def test_stream_rejected_with_retry_after_when_at_capacity(isolated_admission_controller):
+    """Test that analysis gets a 429 with Retry-After once the admission queue is full"""
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    with open("tests/sample.docx", "rb") as file:
+        sha256 = client.post("/upload", files={"file": ("sample.docx", file, docx)}).json()["sha256"]
+    isolated_admission_controller.max_queued_cost = 0
+    isolated_admission_controller.reserve(isolated_admission_controller.capacity)
+    isolated_admission_controller.reserve(1)
+
+    response = client.get(f"/analyze/{sha256}/stream")
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_queued_streams_do_not_exhaust_worker_threads(isolated_admission_controller):
+    """Test that more queued streams than worker threads still all get served"""
+    import asyncio
+    import httpx
+
+    isolated_admission_controller.max_running = 1
+    streams = 45  # more than the 40 threads anyio lends to sync code
+
+    def tokens(file_path, modify):
+        yield "Compliance "
+        yield "Report"
+
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    with open("tests/sample.docx", "rb") as file:
+        sha256 = client.post("/upload", files={"file": ("sample.docx", file, docx)}).json()["sha256"]
+
+    async def stream_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            requests = [http.get(f"/analyze/{sha256}/stream") for _ in range(streams)]
+            return await asyncio.wait_for(asyncio.gather(*requests), timeout=30)
+
+    with patch("file_upload.stream_document", side_effect=tokens):
+        responses = asyncio.run(stream_all())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.text.rstrip().endswith("event: done\ndata: {}") for response in responses)
+    stats = isolated_admission_controller.stats()
+    assert stats["running"] == 0 and stats["queued"] == 0 and stats["timed_out"] == 0
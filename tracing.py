@@ -0,0 +1,244 @@
+# importing required libraries
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# When set, every traced request is written to <TRACE_DIR>/<trace id>.json
+TRACE_DIR = os.getenv("TRACE_DIR")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, labelnames=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                }
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {key: (list(s["counts"]), s["sum"]) for key, s in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _labels(labels + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Holds the process's histograms and renders them for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, description, labelnames=(), buckets=SECONDS_BUCKETS):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, labelnames, buckets)
+            return self._metrics[name]
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "compliance_stage_seconds", "Time spent in each analysis stage.", ["stage"]
+)
+page_seconds = metrics.histogram(
+    "compliance_extract_page_seconds",
+    "Wall time per page of text extraction or OCR.",
+    ["backend"],
+)
+llm_call_seconds = metrics.histogram(
+    "compliance_llm_call_seconds", "Latency of LLM calls that reached the provider.", ["agent"]
+)
+llm_queue_seconds = metrics.histogram(
+    "compliance_llm_queue_seconds",
+    "Time LLM calls waited for the rate-limit budget, including 429 retries and backoff.",
+    ["agent"],
+)
+llm_prompt_tokens = metrics.histogram(
+    "compliance_llm_prompt_tokens",
+    "Estimated prompt tokens per LLM call.",
+    ["agent"],
+    TOKEN_BUCKETS,
+)
+llm_completion_tokens = metrics.histogram(
+    "compliance_llm_completion_tokens",
+    "Estimated completion tokens per LLM call.",
+    ["agent"],
+    TOKEN_BUCKETS,
+)
+
+
+class Trace:
+    """The spans recorded while serving one request or job."""
+
+    def __init__(self, name, **attributes):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "spans": sorted(spans, key=lambda span: span["start"]),
+        }
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name, observe=True, **attributes):
+    """Times a block, records it in the stage histogram and, if a trace is active, as a span.
+
+    The yielded dict can be used to attach attributes known only at the end
+    (token counts, page counts). Spans started inside the block, including
+    in threads that copied the context, record it as their parent.
+    """
+    record = {
+        "id": uuid.uuid4().hex[:16],
+        "parent": current_span.get(),
+        "name": name,
+        "attributes": attributes,
+    }
+    token = current_span.set(record["id"])
+    start = time.perf_counter()
+    record["start"] = time.time()
+    try:
+        yield record["attributes"]
+    except BaseException as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        current_span.reset(token)
+        if observe:
+            stage_seconds.observe(record["seconds"], stage=name)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(record)
+
+
+def record_span(name, started_at, seconds, **attributes):
+    """Adds an already measured span to the active trace.
+
+    For work spread over the steps of a generator, which can't hold a
+    context variable across its yields.
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(
+            {
+                "id": uuid.uuid4().hex[:16],
+                "parent": current_span.get(),
+                "name": name,
+                "attributes": attributes,
+                "start": started_at,
+                "seconds": seconds,
+            }
+        )
+
+
+def observe_llm_call(agent, seconds, prompt_tokens, completion_tokens, queue_seconds=0.0):
+    """Records the latency and token counts of one LLM call that reached the provider.
+
+    ``seconds`` covers only the final attempt sent to the provider; the time
+    spent waiting for the scheduler before it goes in ``queue_seconds``.
+    """
+    llm_call_seconds.observe(seconds, agent=agent)
+    llm_queue_seconds.observe(queue_seconds, agent=agent)
+    llm_prompt_tokens.observe(prompt_tokens, agent=agent)
+    llm_completion_tokens.observe(completion_tokens, agent=agent)
+
+
+@contextmanager
+def trace_request(name, **attributes):
+    """Collects the spans of one request and writes them to TRACE_DIR when it is configured."""
+    trace = Trace(name, **attributes)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            current_trace.reset(token)
+        except ValueError:
+            # Async generators may be finalized in a different context
+            pass
+        if TRACE_DIR:
+            save_trace(trace)
+
+
+def save_trace(trace, directory=None):
+    directory = directory or TRACE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{trace.id}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(trace.to_dict(), file, indent=2)
+    return path
+
+
+def observe_pages(backend, seconds, pages):
+    """Records the average wall time per page of one extraction call."""
+    for _ in range(pages):
+        page_seconds.observe(seconds / pages, backend=backend)
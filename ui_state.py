@@ -0,0 +1,89 @@
+# importing required libraries
+import hashlib
+import itertools
+
+import streamlit as st
+
+# Recent documents offered in the sidebar history
+HISTORY_DOCUMENTS = 20
+
+
+class DocumentState:
+    """What the UI has already done for one uploaded file in this session.
+
+    Streamlit reruns the whole script on every interaction, so every result
+    is kept here and each step only runs while its field is still empty.
+    """
+
+    def __init__(self, name, digest):
+        self.name = name
+        self.digest = digest
+        self.file_path = None
+        # Content hash the API returned for this file's upload; analysis is requested by it
+        self.upload_id = None
+        self.report = None
+        self.rewrite_requested = False
+        self.rewrite = None
+        self.download = None
+
+
+def get_document_state(session_state, name, data):
+    """Returns the memoized state for an uploaded file, keyed by its content hash.
+
+    The same bytes uploaded again (or under another name) get their earlier
+    state back; the display name follows the latest upload.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    if "documents" not in session_state:
+        session_state["documents"] = {}
+    documents = session_state["documents"]
+    state = documents.get(digest)
+    if state is None:
+        state = documents[digest] = DocumentState(name, digest)
+    state.name = name
+    return state
+
+
+def show_or_stream(state, field, tokens, spinner_text):
+    """Shows a memoized result, or streams it once and stores it on the document state.
+
+    ``tokens`` is called to start the stream; a spinner shows until the
+    first token arrives, then the rest is rendered progressively.
+    """
+    text = getattr(state, field)
+    if text is not None:
+        st.markdown(text)
+        return text
+    with st.spinner(spinner_text):
+        tokens = tokens()
+        first_token = next(tokens, "")
+    text = st.write_stream(itertools.chain([first_token], tokens))
+    if text:
+        setattr(state, field, text)
+    return text
+
+
+def render_history(search, documents):
+    """Sidebar history, loaded a page at a time and only for the search or document selected.
+
+    ``search`` and ``documents`` take the arguments of FindingsStore.search
+    and FindingsStore.documents.
+    """
+    query = st.text_input("Search findings", key="history_query")
+    page = st.number_input("Page", min_value=1, value=1, step=1, key="history_page")
+    if query:
+        results = search(query=query, page=page)
+    else:
+        recent = documents(page=1, page_size=HISTORY_DOCUMENTS)["items"]
+        labels = {}
+        for doc in recent:
+            name = doc["filename"] or doc["doc_hash"][:12]
+            labels[f"{name} ({doc['findings']} findings)"] = doc["doc_hash"]
+        choice = st.selectbox("Document", ["Select a document"] + list(labels))
+        if choice not in labels:
+            return
+        results = search(doc_hash=labels[choice], page=page)
+
+    st.caption(f"{results['total']} findings")
+    for finding in results["items"]:
+        st.markdown(f"✅ **{finding['sentence']}**  \n{finding['issue']}")
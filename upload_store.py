@@ -0,0 +1,138 @@
+# importing required libraries
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import aiofiles
+
+UPLOAD_OBJECT_DIR = os.getenv("UPLOAD_OBJECT_DIR", os.path.join("uploads", "objects"))
+UPLOAD_DB_PATH = os.getenv("UPLOAD_DB_PATH", os.path.join(".cache", "uploads.db"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+
+CHUNK_SIZE = 1024 * 1024
+
+SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+class UploadStore:
+    """Content-addressed storage for uploaded documents.
+
+    Each distinct file is stored once as ``<sha256><ext>`` no matter how many
+    times or under which names it is uploaded. Stored files are looked up by
+    content hash only, never by client filename, so two users uploading
+    different files under the same name can't get each other's document; a
+    small SQLite table only remembers display names. Uploads are written to
+    a unique temporary file first, so concurrent uploads never overwrite
+    each other's bytes.
+    """
+
+    def __init__(
+        self,
+        object_dir=UPLOAD_OBJECT_DIR,
+        db_path=UPLOAD_DB_PATH,
+        max_bytes=MAX_UPLOAD_BYTES,
+    ):
+        self.object_dir = object_dir
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.object_dir, exist_ok=True)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS names (
+                    filename TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    uploaded_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    async def save(self, file, filename):
+        """Streams an UploadFile to storage, hashing it on the way.
+
+        Returns ``(sha256, path, deduplicated)``. Raises UploadTooLarge as
+        soon as more than ``max_bytes`` have been received.
+        """
+        filename = os.path.basename(filename)
+        extension = os.path.splitext(filename)[-1].lower()
+        tmp_path = os.path.join(self.object_dir, f".{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(tmp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(
+                            f"File exceeds the maximum upload size of {self.max_bytes} bytes."
+                        )
+                    digest.update(chunk)
+                    await buffer.write(chunk)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        path = os.path.join(self.object_dir, f"{sha256}{extension}")
+        with self._lock:
+            deduplicated = os.path.exists(path)
+            if deduplicated:
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO names (filename, sha256, path, size, uploaded_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (filename, sha256, path, size, time.time()),
+                )
+        return sha256, path, deduplicated
+
+    def path(self, sha256):
+        """Returns the stored path of the upload with this content hash, or None."""
+        if not SHA256_HEX.fullmatch(sha256 or ""):
+            return None
+        matches = glob.glob(os.path.join(glob.escape(self.object_dir), f"{sha256}.*"))
+        return sorted(matches)[0] if matches else None
+
+    def filename(self, sha256):
+        """Returns the name a file with this content hash was most recently uploaded under, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT filename FROM names WHERE sha256 = ? ORDER BY uploaded_at DESC LIMIT 1",
+                (sha256,),
+            ).fetchone()
+        return row[0] if row else None
+
+
+upload_store = UploadStore()
@@ -0,0 +1,143 @@
+# importing required libraries
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", os.path.join(".cache", "verdicts.db"))
+VERDICT_CACHE_ENABLED = os.getenv("VERDICT_CACHE_ENABLED", "true").lower() == "true"
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", 30 * 24 * 3600))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "200000"))
+
+# SQLite's default limit on bound parameters is 999 in older builds
+LOOKUP_BATCH = 500
+
+
+class VerdictCache:
+    """SQLite cache of per-sentence compliance verdicts shared across documents.
+
+    Verdicts are keyed by the normalized-sentence fingerprint and a scope
+    (the model and checker instructions that produced them), so recurring
+    boilerplate is judged once no matter which document it appears in. A
+    verdict is the sentence's finding blocks, or "" for a clean sentence.
+    Entries expire after ``ttl`` seconds; beyond ``max_entries`` the least
+    recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        db_path=VERDICT_CACHE_PATH,
+        ttl=VERDICT_CACHE_TTL,
+        max_entries=VERDICT_CACHE_MAX_ENTRIES,
+        enabled=VERDICT_CACHE_ENABLED,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    scope TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    verdict TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (scope, fingerprint)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, scope, fingerprints):
+        """Returns a {fingerprint: verdict} mapping for the fingerprints that have a live verdict."""
+        wanted = list(dict.fromkeys(fingerprints))
+        if not self.enabled or not wanted:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self._lock, self._connect() as conn:
+            for start in range(0, len(wanted), LOOKUP_BATCH):
+                batch = wanted[start : start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    conn.execute(
+                        "SELECT fingerprint, verdict FROM verdicts"
+                        f" WHERE scope = ? AND created_at >= ? AND fingerprint IN ({placeholders})",
+                        [scope, now - self.ttl] + batch,
+                    ).fetchall()
+                )
+            conn.executemany(
+                "UPDATE verdicts SET accessed_at = ? WHERE scope = ? AND fingerprint = ?",
+                [(now, scope, fingerprint) for fingerprint in found],
+            )
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, scope, verdicts):
+        """Stores {fingerprint: verdict} pairs and evicts expired and least recently used entries."""
+        if not self.enabled or not verdicts:
+            return
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO verdicts"
+                " (scope, fingerprint, verdict, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [(scope, fingerprint, verdict, now, now) for fingerprint, verdict in verdicts.items()],
+            )
+            conn.execute("DELETE FROM verdicts WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM verdicts WHERE rowid IN ("
+                " SELECT rowid FROM verdicts ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+
+    def record_savings(self, tokens):
+        """Adds to the running count of LLM tokens avoided by cached verdicts."""
+        with self._lock:
+            self.tokens_saved += tokens
+
+    def clear(self):
+        """Drops every cached verdict."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM verdicts")
+
+    def stats(self):
+        """Returns hit/miss counters, tokens saved and the number of stored verdicts."""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "tokens_saved": self.tokens_saved,
+            "entries": entries,
+        }
+
+
+verdict_cache = VerdictCache()